@@ -0,0 +1,275 @@
+import asyncio
+import os
+import time
+
+import aiohttp
+
+from download_pool import DownloadCancelled
+from metrics import Metrics, ClipStats
+from quality_policy import QualityPolicy
+from transport import DNS_TTL
+from rate_limiter import RateLimitGovernor
+from stream_writer import StreamWriter, ProgressThrottle, READ_SIZE
+from token_manager import TokenManager
+from twitch_downloader import (GQL_URL, GQL_CLIENT_ID, GQL_BATCH_SIZE,
+                               MIN_CLIP_SIZE, DOWNLOAD_HEADERS, build_clip_queries,
+                               parse_clip_batch, clip_filename)
+from user_resolver import HELIX_USERS_URL
+
+
+class AsyncTwitchClipDownloader:
+    """
+    Variante asyncio du téléchargement des clips de TwitchClipDownloader,
+    utilisée par le mode asynchrone de JobScheduler (la recherche des clips
+    reste synchrone).
+
+    Toutes les requêtes passent par une seule aiohttp.ClientSession dont
+    les connexions keep-alive sont réutilisées, ce qui permet d'avoir des
+    centaines de clips en cours depuis un seul thread.
+
+    Utilisation :
+        async with AsyncTwitchClipDownloader(client_id, client_secret) as downloader:
+            urls = await downloader.get_clip_source_urls(clip_ids)
+            await downloader.download_clip(clip, output_dir, download_url=urls.get(clip['id']))
+    """
+
+    def __init__(self, client_id, client_secret, max_connections=100, max_per_host=20,
+                 token_manager=None, governor=None, metrics=None, quality_policy=None, dns_ttl=DNS_TTL):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        # Un TokenManager partagé (par exemple avec TwitchClipDownloader) évite une authentification
+        self.tokens = token_manager or TokenManager(client_id, client_secret)
+        self.session = None
+        self.governor = governor or RateLimitGovernor()
+        self.metrics = metrics or Metrics()
+        self.quality_policy = quality_policy or QualityPolicy()
+        self.dns_ttl = dns_ttl
+        if self.governor.metrics is None:
+            self.governor.metrics = self.metrics
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections,
+                                         limit_per_host=self.max_per_host,
+                                         use_dns_cache=bool(self.dns_ttl),
+                                         ttl_dns_cache=self.dns_ttl or None)
+        self.session = aiohttp.ClientSession(connector=connector,
+                                             timeout=aiohttp.ClientTimeout(sock_read=60))
+        # L'obtention du token est synchrone : elle se fait hors de la boucle
+        await asyncio.get_running_loop().run_in_executor(None, self.tokens.get_token)
+        return self
+
+    @property
+    def access_token(self):
+        return self.tokens.access_token
+
+    @property
+    def helix_headers(self):
+        return {
+            'Client-ID': self.client_id,
+            'Authorization': f'Bearer {self.access_token}'
+        }
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _helix_get(self, url, params):
+        """
+        Appel Helix rythmé par le RateLimitGovernor, avec nouvelles tentatives
+        sur 429/5xx. Sur un 401, le token est renouvelé une fois et l'appel
+        rejoué. Retourne (statut, données JSON ou None).
+        """
+        used_token = self.access_token
+        status, data = await self._helix_get_once(url, params)
+        if status == 401:
+            new_token = await asyncio.get_running_loop().run_in_executor(
+                None, self.tokens.invalidate, used_token)
+            if new_token != used_token:
+                status, data = await self._helix_get_once(url, params)
+        return status, data
+
+    async def _helix_get_once(self, url, params):
+        governor = self.governor
+        for attempt in range(governor.max_retries + 1):
+            await governor.acquire_async()
+            if attempt:
+                governor.record_retry()
+            try:
+                request_started = time.monotonic()
+                async with self.session.get(url, params=params, headers=self.helix_headers) as response:
+                    governor.observe_latency(time.monotonic() - request_started)
+                    governor.update(response.headers)
+                    status = response.status
+                    if status == 200:
+                        return status, await response.json()
+                    headers = response.headers
+            except aiohttp.ClientError:
+                if attempt == governor.max_retries:
+                    raise
+                await asyncio.sleep(governor.retry_delay(attempt))
+                continue
+
+            if not governor.should_retry(status) or attempt == governor.max_retries:
+                return status, None
+            await asyncio.sleep(governor.retry_delay(attempt, status, headers))
+
+    async def get_user_id(self, username):
+        status, data = await self._helix_get(HELIX_USERS_URL, {'login': username})
+        return data['data'][0]['id'] if data and data['data'] else None
+
+    async def get_clip_source_url(self, clip_id):
+        return (await self.get_clip_source_urls([clip_id])).get(clip_id)
+
+    async def get_clip_source_urls(self, clip_ids, batch_size=GQL_BATCH_SIZE, max_retries=2):
+        """Résout l'URL de la qualité préférée de chaque clip"""
+        renditions = await self.get_clip_renditions(clip_ids, batch_size, max_retries)
+        return {slug: urls[0] for slug, urls in renditions.items()}
+
+    async def get_clip_renditions(self, clip_ids, batch_size=GQL_BATCH_SIZE, max_retries=2):
+        """Résout les URLs des qualités retenues par lots GQL, les lots étant envoyés en parallèle"""
+        resolved = {}
+        pending = list(dict.fromkeys(clip_ids))
+
+        for attempt in range(max_retries + 1):
+            if not pending:
+                break
+            if attempt:
+                self.metrics.record_retry('gql', len(pending))
+            batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            results = await asyncio.gather(*(self._resolve_clip_batch(batch) for batch in batches))
+            pending = []
+            for urls, failed in results:
+                resolved.update(urls)
+                pending.extend(failed)
+
+        return resolved
+
+    async def _resolve_clip_batch(self, slugs):
+        headers = {
+            'Client-Id': GQL_CLIENT_ID
+        }
+        try:
+            request_started = time.monotonic()
+            async with self.session.post(GQL_URL, headers=headers, json=build_clip_queries(slugs)) as response:
+                self.metrics.observe_latency('gql', time.monotonic() - request_started)
+                if response.status != 200:
+                    return {}, list(slugs)
+                data = await response.json()
+        except Exception as e:
+            print(f"Erreur lors de la récupération des URLs source: {str(e)}")
+            return {}, list(slugs)
+
+        return parse_clip_batch(slugs, data, self.quality_policy)
+
+    async def download_clip(self, clip, output_dir, progress_callback=None, download_url=None,
+                            is_cancelled=None, throttle=None, on_size=None):
+        """
+        Télécharge un clip avec reprise du .part, comme la version synchrone.
+        is_cancelled est une fonction interrogée pendant le flux, throttle
+        retourne le délai à attendre après chaque bloc reçu, on_size reçoit
+        la taille annoncée par la réponse avant toute écriture.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+
+        if not download_url:
+            download_url = await self.get_clip_source_url(clip['id'])
+        if not download_url:
+            return False
+
+        filename = clip_filename(clip)
+        filepath = os.path.join(output_dir, filename)
+
+        stats = ClipStats(clip['id'], 0, None, 0.0, False)
+        started = time.monotonic()
+        self.metrics.clip_started()
+        try:
+            stats.success = await self._fetch_clip(download_url, filepath, filename,
+                                                   progress_callback, is_cancelled, stats, throttle, on_size)
+            return stats.success
+        except DownloadCancelled:
+            stats.cancelled = True
+            raise
+        finally:
+            # Un échec pendant l'annulation est compté comme annulé, comme dans ClipJob.record
+            if not stats.success and is_cancelled and is_cancelled():
+                stats.cancelled = True
+            stats.duration = time.monotonic() - started
+            self.metrics.clip_finished(stats)
+
+    async def _fetch_clip(self, download_url, filepath, filename, progress_callback, is_cancelled, stats,
+                          throttle=None, on_size=None):
+        partpath = filepath + '.part'
+
+        try:
+            headers = dict(DOWNLOAD_HEADERS)
+            offset = os.path.getsize(partpath) if os.path.exists(partpath) else 0
+            if offset:
+                headers['Range'] = f'bytes={offset}-'
+
+            request_started = time.monotonic()
+            response = await self.session.get(download_url, headers=headers)
+            stats.ttfb = time.monotonic() - request_started
+            if offset and response.status == 416:
+                response.release()
+                del headers['Range']
+                response = await self.session.get(download_url, headers=headers)
+
+            async with response:
+                if offset and response.status != 206:
+                    offset = 0
+                response.raise_for_status()
+
+                total_size = offset + int(response.headers.get('content-length', 0))
+                if total_size < MIN_CLIP_SIZE:
+                    if os.path.exists(partpath):
+                        os.remove(partpath)
+                    return False
+                if on_size:
+                    on_size(total_size)
+
+                progress = ProgressThrottle(progress_callback)
+                loop = asyncio.get_running_loop()
+                # Un tampon par flux : les téléchargements partagent le même
+                # thread. Ouverture, écritures disque et fermeture passent par
+                # le pool de threads de la boucle, et sans synchronisation
+                # périodique : aucun appel bloquant dans la boucle.
+                writer = await loop.run_in_executor(
+                    None, lambda: StreamWriter(partpath, offset, total_size,
+                                               buffer=bytearray(READ_SIZE), sync_every=0))
+                try:
+                    async for chunk in response.content.iter_chunked(READ_SIZE):
+                        if is_cancelled and is_cancelled():
+                            raise DownloadCancelled()
+                        if writer.available < len(chunk):
+                            await loop.run_in_executor(None, writer.flush)
+                        writer.write(chunk)
+                        stats.bytes += len(chunk)
+                        self.metrics.add_bytes(len(chunk))
+                        progress(writer.written, total_size, filename)
+                        if throttle:
+                            delay = throttle(len(chunk))
+                            if delay:
+                                await asyncio.sleep(delay)
+                finally:
+                    # Tampon vidé même après une erreur : le .part reste reprenable
+                    await loop.run_in_executor(None, writer.close)
+
+            if os.path.getsize(partpath) < total_size:
+                return False
+
+            os.replace(partpath, filepath)
+            return True
+
+        except DownloadCancelled:
+            raise
+        except Exception:
+            return False
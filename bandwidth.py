@@ -0,0 +1,160 @@
+import threading
+import time
+from datetime import datetime
+
+# Unité des débits de la configuration (Mo/s, comme les métriques)
+MEGABYTE = 1000000
+
+# Intervalle de réévaluation des plages horaires (en secondes)
+PROFILE_CHECK_INTERVAL = 30
+
+# Attente maximale d'un seul tenant, pour garder l'annulation réactive
+MAX_WAIT = 0.5
+
+
+def parse_time(value):
+    """Minutes depuis minuit d'une heure "HH:MM" """
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+class TokenBucket:
+    """
+    Seau à jetons partagé entre threads. reserve ne bloque pas : les octets
+    sont décomptés tout de suite (le solde peut devenir négatif) et
+    l'appelant attend le délai retourné, avec time.sleep ou asyncio.sleep.
+    Un débit nul désactive la limite.
+    """
+
+    def __init__(self, rate=0):
+        self._lock = threading.Lock()
+        self.rate = 0
+        self.tokens = 0.0
+        self._last = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate
+            # Une seconde de débit au plus peut être accumulée pendant une pause
+            self.tokens = min(self.tokens, rate)
+
+    def reserve(self, count):
+        """Décompte count octets et retourne le délai (en secondes) avant de continuer"""
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            self.tokens -= count
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class BandwidthProfile:
+    """
+    Plages horaires de limitation du débit global, par exemple :
+        [{"start": "09:00", "end": "18:00", "days": [0, 1, 2, 3, 4], "percent": 20}]
+    percent s'applique au débit maximal configuré ; limit fixe directement
+    un débit en Mo/s. days (0 pour lundi) est facultatif, et une plage dont
+    la fin précède le début passe minuit. Hors des plages, le débit
+    maximal s'applique.
+    """
+
+    def __init__(self, windows=None):
+        self.windows = []
+        for window in windows or []:
+            self.windows.append({
+                'start': parse_time(window['start']),
+                'end': parse_time(window['end']),
+                'days': set(window['days']) if window.get('days') is not None else None,
+                'percent': window.get('percent'),
+                'limit': window.get('limit'),
+            })
+
+    def _matches(self, window, now):
+        minute = now.hour * 60 + now.minute
+        start, end = window['start'], window['end']
+        if start <= end:
+            inside = start <= minute < end
+            day = now.weekday()
+        else:
+            inside = minute >= start or minute < end
+            # Après minuit, la plage appartient au jour où elle a commencé
+            day = now.weekday() if minute >= start else (now.weekday() - 1) % 7
+        return inside and (window['days'] is None or day in window['days'])
+
+    def rate(self, max_rate, now=None):
+        """Débit global (octets/s) à appliquer à l'heure now, 0 sans limite"""
+        now = now or datetime.now()
+        for window in self.windows:
+            if not self._matches(window, now):
+                continue
+            if window['limit'] is not None:
+                return window['limit'] * MEGABYTE
+            if window['percent'] is not None and max_rate:
+                return max_rate * window['percent'] / 100
+        return max_rate
+
+
+class BandwidthScheduler:
+    """
+    Limitation du débit des téléchargements : un seau global partagé par
+    tous les flux, selon les plages horaires du profil, et un seau par job
+    de job_rate octets/s. Les flux demandent le délai à respecter après
+    chaque lecture (delay) ; sans aucune limite configurée, rien n'est
+    décompté.
+    """
+
+    def __init__(self, max_rate=0, job_rate=0, profile=None):
+        self.max_rate = max_rate
+        self.job_rate = job_rate
+        self.profile = profile or BandwidthProfile()
+        self.bucket = TokenBucket(self.profile.rate(max_rate))
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+
+    @property
+    def enabled(self):
+        return bool(self.max_rate or self.job_rate or self.profile.windows)
+
+    def _job_bucket(self, key):
+        with self._lock:
+            bucket = self._jobs.get(key)
+            if bucket is None:
+                bucket = self._jobs[key] = TokenBucket(self.job_rate)
+            return bucket
+
+    def _update_profile(self):
+        now = time.monotonic()
+        if now - self._checked < PROFILE_CHECK_INTERVAL:
+            return
+        self._checked = now
+        rate = self.profile.rate(self.max_rate)
+        if rate != self.bucket.rate:
+            self.bucket.set_rate(rate)
+
+    def delay(self, count, job=None):
+        """Décompte count octets reçus pour job et retourne le délai d'attente en secondes"""
+        self._update_profile()
+        wait = self.bucket.reserve(count)
+        if job is not None and self.job_rate:
+            wait = max(wait, self._job_bucket(job).reserve(count))
+        return wait
+
+    def for_job(self, job):
+        """Fonction count -> délai pour les flux d'un job, à passer aux téléchargeurs"""
+        if not self.enabled:
+            return None
+        return lambda count: self.delay(count, job)
+
+
+def throttle_wait(delay, is_cancelled=None):
+    """Attend delay secondes par pas courts, en s'arrêtant si is_cancelled() devient vrai"""
+    end = time.monotonic() + delay
+    while True:
+        remaining = end - time.monotonic()
+        if remaining <= 0 or (is_cancelled and is_cancelled()):
+            return
+        time.sleep(min(remaining, MAX_WAIT))
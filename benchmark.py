@@ -0,0 +1,424 @@
+"""
+Banc d'essai reproductible, sans accès réseau.
+
+Un serveur local imite les API utilisées par le téléchargeur : token
+OAuth, Helix /users et /clips (avec pagination et en-têtes Ratelimit),
+GQL VideoAccessToken_Clip et un CDN servant des MP4 synthétiques. La
+latence, la bande passante par connexion, l'injection de réponses 429 et
+le nombre de clips et de chaînes sont réglables.
+
+Chaque scénario est exécuté dans un processus séparé pour que le pic de
+mémoire mesuré (RSS) lui soit propre, et rapporte clips/s, Mo/s et RSS.
+
+Exemples :
+    python benchmark.py
+    python benchmark.py --clips 500 --latency 0.05 --bandwidth 2000000 --rate-limit-every 50
+    python benchmark.py --scenario thread --async --json
+    python benchmark.py --channels 50 --latency 0.05
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+CHANNEL = 'benchchannel'
+CREATOR = 'benchcreator'
+USERS = {CHANNEL: '1000', CREATOR: '2000'}
+START_DATE = date(2024, 1, 1)
+END_DATE = date(2024, 3, 1)
+
+SCENARIOS = ('downloader', 'thread')
+
+
+def channel_names(count):
+    """Noms des chaînes servies : benchchannel, benchchannel2, benchchannel3..."""
+    return [CHANNEL] + [f'{CHANNEL}{i}' for i in range(2, count + 1)]
+
+# Qualités servies pour chaque clip -> diviseur de clip_size
+QUALITY_SIZES = {'1080': 1, '720': 2, '480': 4}
+
+
+class MockTwitchServer:
+    """
+    Serveur HTTP local imitant Twitch pour les benchmarks.
+
+    latency est ajoutée à chaque réponse (en secondes), bandwidth limite le
+    débit de chaque connexion CDN (octets/s, 0 pour illimité) et une
+    requête Helix sur rate_limit_every reçoit une réponse 429. Les dates
+    des clips sont tirées avec une graine fixe pour que deux exécutions
+    servent exactement les mêmes données. Avec channels chaînes, les clips
+    du créateur sont répartis entre elles. Chaque clip existe en 1080p
+    (clip_size octets), 720p (la moitié) et 480p (le quart).
+    """
+
+    def __init__(self, clips=200, clip_size=500000, latency=0.0, bandwidth=0,
+                 rate_limit_every=0, seed=42, channels=1):
+        self.clip_size = clip_size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.rate_limit_every = rate_limit_every
+        self.helix_requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._payload = bytes(range(256)) * (clip_size // 256 + 1)
+
+        self.users = dict(USERS)
+        for i, name in enumerate(channel_names(channels)[1:], 1):
+            self.users[name] = str(int(USERS[CHANNEL]) + i)
+        broadcasters = channel_names(channels)
+
+        rng = random.Random(seed)
+        period = (END_DATE - START_DATE).total_seconds()
+        self.clips = sorted(({
+            'id': f'BenchClip{i:06d}',
+            # Titres répétés, comme sur Twitch : les fichiers ne doivent pas s'écraser
+            'title': f'Bench clip {i % 50}',
+            'broadcaster_id': self.users[broadcasters[i % len(broadcasters)]],
+            'broadcaster_name': broadcasters[i % len(broadcasters)],
+            'creator_id': USERS[CREATOR],
+            'creator_name': CREATOR,
+            'game_id': str(rng.randrange(1, 20)),
+            'view_count': rng.randrange(1, 100000),
+            'duration': 30.0,
+            'created_at': (datetime.combine(START_DATE, datetime.min.time())
+                           + timedelta(seconds=rng.uniform(0, period))).strftime('%Y-%m-%dT%H:%M:%SZ')
+        } for i in range(clips)), key=lambda clip: clip['created_at'])
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.httpd.server_port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _next_helix_request(self):
+        """Compte les requêtes Helix et indique si celle-ci doit recevoir un 429"""
+        with self._lock:
+            self.helix_requests += 1
+            if self.rate_limit_every and self.helix_requests % self.rate_limit_every == 0:
+                self.rate_limited += 1
+                return True
+        return False
+
+    def _clips_page(self, query):
+        started_at = query['started_at'][0]
+        ended_at = query['ended_at'][0]
+        first = int(query.get('first', ['20'])[0])
+        offset = int(query.get('after', ['0'])[0])
+        matches = [clip for clip in self.clips
+                   if clip['broadcaster_id'] == query['broadcaster_id'][0]
+                   and started_at <= clip['created_at'] < ended_at]
+        page = matches[offset:offset + first]
+        cursor = str(offset + first) if offset + first < len(matches) else None
+        return {'data': page, 'pagination': {'cursor': cursor} if cursor else {}}
+
+    def _gql_batch(self, operations):
+        return [{
+            'data': {
+                'clip': {
+                    'playbackAccessToken': {'signature': 'bench', 'value': 'bench'},
+                    'videoQualities': [
+                        {'quality': quality, 'frameRate': 60 if quality == '1080' else 30,
+                         'sourceURL': f"{self.base_url}/cdn/{op['variables']['slug']}-{quality}.mp4"}
+                        for quality in QUALITY_SIZES
+                    ]
+                }
+            }
+        } for op in operations]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, data, status=200, headers=None):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def read_body(self):
+                length = int(self.headers.get('Content-Length', 0))
+                return self.rfile.read(length) if length else b''
+
+            def do_POST(self):
+                body = self.read_body()
+                if server.latency:
+                    time.sleep(server.latency)
+                path = urlparse(self.path).path
+                if path == '/oauth2/token':
+                    self.send_json({'access_token': 'bench-token', 'expires_in': 86400, 'token_type': 'bearer'})
+                elif path == '/gql':
+                    self.send_json(server._gql_batch(json.loads(body)))
+                else:
+                    self.send_json({'error': 'Not Found'}, 404)
+
+            def do_HEAD(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                if urlparse(self.path).path.startswith('/cdn/'):
+                    self.send_clip(head=True)
+                else:
+                    self.send_json({'error': 'Not Found'}, 404)
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urlparse(self.path)
+                if url.path.startswith('/cdn/'):
+                    self.send_clip()
+                    return
+
+                if url.path not in ('/helix/users', '/helix/clips'):
+                    self.send_json({'error': 'Not Found'}, 404)
+                    return
+
+                reset = str(int(time.time()) + 1)
+                if server._next_helix_request():
+                    self.send_json({'error': 'Too Many Requests'}, 429, {
+                        'Ratelimit-Limit': '800', 'Ratelimit-Remaining': '0', 'Ratelimit-Reset': reset})
+                    return
+
+                rate_headers = {'Ratelimit-Limit': '800', 'Ratelimit-Remaining': '799', 'Ratelimit-Reset': reset}
+                query = parse_qs(url.query)
+                if url.path == '/helix/users':
+                    users = [{'id': server.users[login], 'login': login}
+                             for login in query.get('login', []) if login in server.users]
+                    self.send_json({'data': users}, headers=rate_headers)
+                else:
+                    self.send_json(server._clips_page(query), headers=rate_headers)
+
+            def send_clip(self, head=False):
+                quality = re.search(r'-(\d+)\.mp4$', urlparse(self.path).path)
+                payload = server._payload[:server.clip_size // QUALITY_SIZES.get(quality and quality.group(1), 1)]
+                offset = 0
+                end = len(payload)
+                match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+                if match:
+                    offset = int(match.group(1))
+                    if match.group(2):
+                        end = min(end, int(match.group(2)) + 1)
+                    if offset >= len(payload):
+                        self.send_response(416)
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {offset}-{end - 1}/{len(payload)}')
+                else:
+                    self.send_response(200)
+                body = payload[offset:end]
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('Content-Type', 'video/mp4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if head:
+                    return
+
+                chunk_size = 65536
+                try:
+                    for i in range(0, len(body), chunk_size):
+                        chunk = body[i:i + chunk_size]
+                        self.wfile.write(chunk)
+                        if server.bandwidth:
+                            time.sleep(len(chunk) / server.bandwidth)
+                except ConnectionError:
+                    # Client parti en cours de route (annulation, fin d'un segment)
+                    self.close_connection = True
+
+        return Handler
+
+
+def patch_endpoints(base_url):
+    """Redirige les URLs Twitch des modules du téléchargeur vers le serveur local"""
+    import async_downloader
+    import clip_enumerator
+    import token_manager
+    import twitch_downloader
+    import user_resolver
+
+    token_manager.AUTH_URL = f'{base_url}/oauth2/token'
+    user_resolver.HELIX_USERS_URL = f'{base_url}/helix/users'
+    clip_enumerator.HELIX_CLIPS_URL = f'{base_url}/helix/clips'
+    twitch_downloader.GQL_URL = f'{base_url}/gql'
+    async_downloader.HELIX_USERS_URL = user_resolver.HELIX_USERS_URL
+    async_downloader.GQL_URL = twitch_downloader.GQL_URL
+
+
+def run_downloader(options):
+    """TwitchClipDownloader seul : résolution, énumération, URLs GQL puis pool de téléchargement"""
+    from download_pool import DownloadPool
+    from twitch_downloader import TwitchClipDownloader
+
+    downloader = TwitchClipDownloader('bench-client', 'bench-secret')
+    pool = DownloadPool(options['workers'], options['workers'])
+    pool.metrics = downloader.metrics
+    try:
+        channels = channel_names(options['channels'])
+        ids = downloader.get_user_ids(channels + [CREATOR])
+        if len(channels) > 1:
+            clips = list(downloader.iter_clips_multi([ids[name] for name in channels], ids[CREATOR],
+                                                     START_DATE, END_DATE, max_workers=options['workers']))
+        else:
+            clips = downloader.get_clips(ids[CHANNEL], ids[CREATOR], START_DATE, END_DATE,
+                                         max_workers=options['workers'])
+        source_urls = downloader.get_clip_source_urls([clip['id'] for clip in clips])
+        results = [outcome for _, _, outcome in pool.map(
+            lambda clip: downloader.download_clip(clip, 'clips', pool=pool,
+                                                  download_url=source_urls.get(clip['id'])),
+            clips)]
+    finally:
+        downloader.tokens.stop()
+    return sum(1 for outcome in results if outcome is True), len(results) - results.count(True)
+
+
+def run_thread(options):
+    """DownloaderThread de bout en bout, exécuté dans le thread courant"""
+    from clip_job import ClipJob, FanOutJob
+    from gui_progress import ProgressHub
+    from main import DownloaderThread
+
+    channels = channel_names(options['channels'])
+    if len(channels) > 1:
+        job = FanOutJob(channels, CREATOR, START_DATE, END_DATE)
+    else:
+        job = ClipJob(CHANNEL, CREATOR, START_DATE, END_DATE)
+    thread = DownloaderThread('bench-client', 'bench-secret', [job], ProgressHub(),
+                              max_workers=options['workers'], max_per_host=options['workers'],
+                              use_async=options['use_async'],
+                              async_concurrency=options['async_concurrency'])
+    results = []
+    thread.finished.connect(results.append)
+    thread.run()
+    result = results[0] if results else {}
+    if not result.get('success'):
+        raise RuntimeError(result.get('message', "Le téléchargement n'a pas abouti"))
+    return result['successful'], result['failed']
+
+
+def _scenario_process(name, base_url, options, queue):
+    patch_endpoints(base_url)
+    workdir = tempfile.mkdtemp(prefix='twitch-bench-')
+    os.chdir(workdir)
+    try:
+        started = time.monotonic()
+        successful, failed = (run_thread if name == 'thread' else run_downloader)(options)
+        elapsed = time.monotonic() - started
+        total_bytes = sum(os.path.getsize(os.path.join(root, filename))
+                          for root, _, files in os.walk(workdir)
+                          for filename in files if filename.endswith('.mp4'))
+        # ru_maxrss est en kilo-octets sous Linux et en octets sous macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+        queue.put({
+            'scenario': name,
+            'async': options['use_async'] if name == 'thread' else False,
+            'clips': successful,
+            'failed': failed,
+            'elapsed': round(elapsed, 3),
+            'clips_per_s': round(successful / elapsed, 2) if elapsed else 0.0,
+            'mb_per_s': round(total_bytes / elapsed / 1e6, 2) if elapsed else 0.0,
+            'peak_rss_mb': round(peak_rss_mb, 1)
+        })
+    except Exception as e:
+        queue.put({'scenario': name, 'error': str(e)})
+    finally:
+        os.chdir(tempfile.gettempdir())
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_scenario(name, server, options):
+    """Exécute un scénario dans un processus séparé et retourne son rapport"""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_scenario_process,
+                                      args=(name, server.base_url, options, queue))
+    process.start()
+    report = queue.get()
+    process.join()
+    report['rate_limited'] = server.rate_limited
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai du téléchargeur contre un faux serveur Twitch local")
+    parser.add_argument('--scenario', choices=SCENARIOS + ('all',), default='all', help="Scénario à exécuter")
+    parser.add_argument('--clips', type=int, default=200, help="Nombre de clips servis")
+    parser.add_argument('--channels', type=int, default=1, help="Nombre de chaînes entre lesquelles les clips sont répartis")
+    parser.add_argument('--clip-size', type=int, default=500000, help="Taille de chaque clip en octets")
+    parser.add_argument('--latency', type=float, default=0.0, help="Latence ajoutée à chaque réponse (s)")
+    parser.add_argument('--bandwidth', type=int, default=0, help="Débit par connexion CDN en octets/s (0 : illimité)")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="Répond 429 à une requête Helix sur N")
+    parser.add_argument('--workers', type=int, default=4, help="Téléchargements simultanés")
+    parser.add_argument('--async', dest='use_async', action='store_true', help="Mode asynchrone pour le scénario thread")
+    parser.add_argument('--async-concurrency', type=int, default=100, help="Flux simultanés en mode asynchrone")
+    parser.add_argument('--repeat', type=int, default=1, help="Nombre d'exécutions de chaque scénario")
+    parser.add_argument('--seed', type=int, default=42, help="Graine des données générées")
+    parser.add_argument('--json', action='store_true', help="Écrit les rapports en JSON Lines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = {
+        'workers': args.workers,
+        'use_async': args.use_async,
+        'async_concurrency': args.async_concurrency,
+        'channels': args.channels
+    }
+    scenarios = SCENARIOS if args.scenario == 'all' else (args.scenario,)
+
+    reports = []
+    for name in scenarios:
+        for _ in range(args.repeat):
+            # Un serveur neuf par exécution : compteurs de 429 remis à zéro
+            server = MockTwitchServer(args.clips, args.clip_size, args.latency, args.bandwidth,
+                                      args.rate_limit_every, args.seed, args.channels).start()
+            try:
+                report = run_scenario(name, server, options)
+            finally:
+                server.stop()
+            reports.append(report)
+
+            if args.json:
+                print(json.dumps(report))
+            elif 'error' in report:
+                print(f"{name:<12} Erreur: {report['error']}")
+            else:
+                print(f"{name:<12} {report['clips']:>6} clips  {report['elapsed']:>8.2f} s  "
+                      f"{report['clips_per_s']:>8.2f} clips/s  {report['mb_per_s']:>8.2f} Mo/s  "
+                      f"RSS max {report['peak_rss_mb']:>7.1f} Mo  429: {report['rate_limited']}")
+
+    return 1 if any('error' in report or report.get('failed') for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Point d'entrée en ligne de commande, sans interface graphique.
+
+Exécute un ou plusieurs jobs (chaîne, créateur, période) dans un même
+JobScheduler (une seule session Twitch, un seul pool de téléchargement)
+et écrit la progression en JSON Lines sur la sortie standard.
+
+Exemples :
+    python cli.py --channel CHAINE --creator CREATEUR --start 2024-01-01 --end 2024-02-01
+    python cli.py --channel CHAINE1,CHAINE2 --creator CREATEUR --start 2024-01-01 --end 2024-02-01
+    python cli.py manifest.json
+    python cli.py manifest.json --estimate --throughput 20
+
+Format du manifeste :
+    {"jobs": [{"channel": "...", "creator": "...", "start": "2024-01-01", "end": "2024-02-01"}]}
+    Une entrée avec "channels": ["...", "..."] à la place de "channel"
+    recherche les clips du créateur sur toutes ces chaînes à la fois.
+"""
+import argparse
+import json
+import signal
+import sys
+import time
+from dataclasses import asdict
+
+from config_manager import ConfigManager
+from twitch_downloader import TwitchClipDownloader
+from download_pool import DownloadPool
+from bandwidth import BandwidthScheduler, BandwidthProfile, MEGABYTE
+from output_manager import OutputManager
+from clip_index import ClipIndex
+from clip_job import ClipJob
+from job_scheduler import JobScheduler
+from metrics import MetricsExporter
+from preflight import Preflight, summarize
+from quality_policy import QualityPolicy
+from transport import Transport
+
+
+def emit(data):
+    """Écrit un événement JSON sur une ligne"""
+    data = dict(data, time=round(time.time(), 3))
+    sys.stdout.write(json.dumps(data, ensure_ascii=False) + '\n')
+    sys.stdout.flush()
+
+
+def load_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    entries = manifest['jobs'] if isinstance(manifest, dict) else manifest
+    return [ClipJob.from_dict(entry) for entry in entries]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Téléchargement en masse de clips Twitch sans interface graphique")
+    parser.add_argument('manifest', nargs='?', help="Fichier JSON listant les jobs à exécuter")
+    parser.add_argument('--channel', help="Nom de la chaîne Twitch, ou plusieurs séparés par des virgules")
+    parser.add_argument('--creator', help="Nom du créateur des clips")
+    parser.add_argument('--start', help="Date de début (AAAA-MM-JJ)")
+    parser.add_argument('--end', help="Date de fin (AAAA-MM-JJ)")
+    parser.add_argument('--config', default='config.json', help="Fichier de configuration")
+    parser.add_argument('--verbose', action='store_true', help="Inclut les messages de log dans la sortie")
+    parser.add_argument('--metrics', help="Fichier d'export des métriques (.prom ou JSON Lines)")
+    parser.add_argument('--estimate', action='store_true',
+                        help="Estime la taille et la durée des jobs sans rien télécharger")
+    parser.add_argument('--throughput', type=float,
+                        help="Débit attendu en Mo/s, pour estimer la durée des téléchargements")
+    args = parser.parse_args(argv)
+
+    if not args.manifest and not all([args.channel, args.creator, args.start, args.end]):
+        parser.error("indiquez un manifeste ou --channel, --creator, --start et --end")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config_manager = ConfigManager(args.config)
+
+    if not config_manager.get_client_id() or not config_manager.get_client_secret():
+        emit({"event": "error", "message": "Client ID et Client Secret manquants dans la configuration"})
+        return 2
+
+    if args.manifest:
+        jobs = load_manifest(args.manifest)
+    else:
+        channels = [name.strip() for name in args.channel.split(',') if name.strip()]
+        entry = {"channels": channels} if len(channels) > 1 else {"channel": channels[0]}
+        jobs = [ClipJob.from_dict(dict(entry, creator=args.creator, start=args.start, end=args.end))]
+
+    # Session et pool partagés par tous les jobs
+    downloader = TwitchClipDownloader(config_manager.get_client_id(), config_manager.get_client_secret(),
+                                      user_cache_path=config_manager.get_user_cache_path(),
+                                      token_cache_path=config_manager.get_token_cache_path(),
+                                      quality_policy=QualityPolicy(config_manager.get_max_height(),
+                                                                   config_manager.get_max_fps(),
+                                                                   config_manager.get_max_bitrate()),
+                                      transport=Transport(config_manager.get_http_pool_size(),
+                                                          config_manager.get_http2(),
+                                                          config_manager.get_dns_cache_ttl()))
+    pool = DownloadPool(config_manager.get_max_workers(), config_manager.get_max_connections_per_host())
+
+    if args.estimate:
+        return estimate(args, jobs, downloader, pool, config_manager)
+
+    def cancel(signum, frame):
+        emit({"event": "cancel"})
+        pool.cancel()
+
+    signal.signal(signal.SIGINT, cancel)
+    signal.signal(signal.SIGTERM, cancel)
+
+    scheduler = JobScheduler(downloader, pool,
+                             index_path=config_manager.get_index_path(),
+                             use_async=config_manager.get_async_downloads(),
+                             async_concurrency=config_manager.get_async_concurrency(),
+                             store_path=config_manager.get_store_path() or None,
+                             preflight=config_manager.get_preflight(),
+                             postprocess=config_manager.get_postprocess(),
+                             postprocess_workers=config_manager.get_postprocess_workers() or None,
+                             bandwidth=BandwidthScheduler(
+                                 config_manager.get_max_bandwidth() * MEGABYTE,
+                                 config_manager.get_job_bandwidth() * MEGABYTE,
+                                 BandwidthProfile(config_manager.get_bandwidth_schedule())),
+                             outputs=OutputManager(config_manager.get_overflow_dirs(),
+                                                   config_manager.get_min_free_space() * MEGABYTE))
+    numbers = {}
+    for job in jobs:
+        if scheduler.add(job):
+            numbers[id(job)] = len(numbers) + 1
+            emit(dict(job.describe(), event="job_queued", job=numbers[id(job)]))
+        else:
+            emit(dict(job.describe(), event="job_duplicate"))
+
+    def on_event(job, data):
+        emit(dict(data, job=numbers[id(job)]))
+
+    def on_message(job, text):
+        emit({"event": "log", "job": numbers[id(job)], "message": text})
+
+    metrics_path = args.metrics or config_manager.get_metrics_path()
+    exporter = MetricsExporter(downloader.metrics, metrics_path) if metrics_path else None
+    if exporter:
+        exporter.start()
+    try:
+        results = scheduler.run(on_message=on_message if args.verbose else None,
+                                on_event=on_event)
+    finally:
+        if exporter:
+            exporter.stop()
+
+    failed_jobs = 0
+    for job, result in zip(scheduler.jobs, results):
+        if not result["success"] or result.get("failed"):
+            failed_jobs += 1
+        emit(dict(job.describe(), event="job_done", job=numbers[id(job)], **result))
+
+    emit({"event": "done", "jobs": len(scheduler.jobs), "failed_jobs": failed_jobs,
+          "cancelled": pool.is_cancelled(), "metrics": asdict(downloader.metrics.snapshot())})
+    return 1 if failed_jobs else 0
+
+
+def estimate(args, jobs, downloader, pool, config_manager):
+    """Écrit un événement estimate par job (clips, octets, durée de vidéo) sans rien télécharger"""
+    preflight = Preflight(downloader, pool.max_workers * 2)
+    throughput = args.throughput * MEGABYTE if args.throughput else None
+    index = ClipIndex(config_manager.get_index_path() or ':memory:')
+    estimates = []
+    failed_jobs = 0
+    try:
+        downloader.get_user_ids([name for job in jobs for name in job.logins()])
+        for number, job in enumerate(jobs, 1):
+            try:
+                job_estimates = preflight.estimate_job(job, pool.max_workers, index)
+            except Exception as e:
+                failed_jobs += 1
+                emit(dict(job.describe(), event="error", job=number, message=str(e)))
+                continue
+            estimates.extend(job_estimates)
+            emit(dict(job.describe(), event="estimate", job=number, **summarize(job_estimates, throughput)))
+    finally:
+        index.close()
+
+    emit(dict(summarize(estimates, throughput), event="estimate_done", jobs=len(jobs), failed_jobs=failed_jobs))
+    return 1 if failed_jobs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
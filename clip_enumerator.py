@@ -0,0 +1,219 @@
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, time, timedelta
+
+HELIX_CLIPS_URL = 'https://api.twitch.tv/helix/clips'
+
+# Clips par page Helix
+PAGE_SIZE = 100
+
+
+class ClipEnumerationError(Exception):
+    """Levée lorsqu'une page de clips n'a pas pu être récupérée"""
+    pass
+
+
+def to_datetime(value):
+    """Convertit une date en datetime à minuit (les datetime sont conservés)"""
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time())
+
+
+def format_helix_datetime(value):
+    return f"{value.strftime('%Y-%m-%dT%H:%M:%S')}Z"
+
+
+def parse_helix_datetime(value):
+    """Date Helix ("2024-01-05T12:00:00Z") en datetime sans fuseau, None si absente ou illisible"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+    except (TypeError, ValueError):
+        return None
+
+
+class ClipEnumerator:
+    """
+    Parcourt les clips d'une chaîne en découpant la période en fenêtres
+    temporelles récupérées en parallèle.
+
+    L'API Helix ne permet pas de filtrer par créateur : le filtre reste
+    appliqué côté client. Quand les pages d'une fenêtre sont triées par
+    date, la densité des clips déjà lus donne le nombre de clips restants
+    : si ce reste dépasse max_pages pages, seule la partie de la fenêtre
+    pas encore couverte est redécoupée, en fenêtres d'environ max_pages
+    pages parcourues en parallèle. Aucune page déjà lue n'est redemandée,
+    le coût suit donc le nombre de clips de la chaîne. Une fenêtre dont
+    les pages ne sont pas triées par date est parcourue jusqu'au bout.
+    L'énumération s'arrête dès que la limite de clips est atteinte.
+    """
+
+    def __init__(self, session, max_workers=4, max_pages=5,
+                 min_window=timedelta(hours=1), cancel=None):
+        self.session = session
+        # Événement partagé avec d'autres recherches : une fois levé, l'énumération s'arrête
+        self.cancel = cancel
+        self.max_workers = max(1, int(max_workers))
+        self.max_pages = max(1, int(max_pages))
+        self.min_window = min_window
+        # Faux si la dernière énumération a été interrompue (erreur ou limite)
+        self.complete = False
+        # Créé une fois pour toutes : un stop() reçu avant enumerate n'est pas perdu.
+        # Un énumérateur ne sert donc qu'à une seule énumération.
+        self._stop = threading.Event()
+
+    def enumerate(self, broadcaster_id, creator_id, start_date, end_date, limit=None, on_page=None,
+                  on_clips=None):
+        """
+        Retourne les clips de creator_id (tous les clips si creator_id est None).
+        on_page, s'il est fourni, reçoit chaque page brute de clips de la chaîne.
+        Avec on_clips, les nouveaux clips correspondants lui sont transmis au
+        fil des pages au lieu d'être gardés en mémoire, et la liste retournée
+        est vide.
+        """
+        start = to_datetime(start_date)
+        end = to_datetime(end_date)
+        if end <= start:
+            self.complete = True
+            return []
+
+        self._lock = threading.Lock()
+        self._matches = {}
+        self._seen = set()
+        self._limit = limit
+        self._on_page = on_page
+        self._on_clips = on_clips
+        self._error = None
+        self.complete = not self._stopped()
+
+        windows = self._split(start, end, self.max_workers)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {executor.submit(self._fetch_window, broadcaster_id, creator_id, w_start, w_end)
+                       for w_start, w_end in windows}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for w_start, w_end in future.result():
+                        if not self._stopped():
+                            pending.add(executor.submit(self._fetch_window, broadcaster_id,
+                                                        creator_id, w_start, w_end))
+
+        if self.cancel is not None and self.cancel.is_set():
+            self.complete = False
+        if self._error:
+            # Une liste tronquée ne doit pas passer pour un résultat complet
+            raise ClipEnumerationError(self._error)
+
+        clips = sorted(self._matches.values(), key=lambda clip: clip.get('created_at', ''))
+        if limit:
+            return clips[:limit]
+        return clips
+
+    def stop(self):
+        """Interrompt une énumération en cours (depuis un autre thread)"""
+        self.complete = False
+        self._stop.set()
+
+    def _stopped(self):
+        return self._stop.is_set() or (self.cancel is not None and self.cancel.is_set())
+
+    def _split(self, start, end, parts):
+        step = (end - start) / parts
+        bounds = [start + step * i for i in range(parts)] + [end]
+        return [(bounds[i], bounds[i + 1]) for i in range(parts)]
+
+    def _fetch_window(self, broadcaster_id, creator_id, start, end):
+        """
+        Récupère une fenêtre. Retourne la liste des sous-fenêtres qui
+        couvrent la partie restante si elle a été redécoupée, sinon une
+        liste vide.
+        """
+        params = {
+            'broadcaster_id': broadcaster_id,
+            'started_at': format_helix_datetime(start),
+            'ended_at': format_helix_datetime(end),
+            'first': PAGE_SIZE
+        }
+        can_split = (end - start) >= self.min_window * 2
+        # Dates des clips lus, tant que les pages restent triées par date
+        times = []
+
+        while not self._stopped():
+            response = self.session.get(HELIX_CLIPS_URL, params=params)
+            if response.status_code != 200:
+                self.complete = False
+                self._error = (f"Erreur HTTP {response.status_code} lors de la récupération des clips "
+                               f"entre {params['started_at']} et {params['ended_at']}")
+                self._stop.set()
+                break
+
+            data = response.json()
+            clips = data.get('data', [])
+            self._add_matches(clips, creator_id)
+
+            cursor = data.get('pagination', {}).get('cursor')
+            if not cursor:
+                break
+
+            if can_split:
+                times.extend(parse_helix_datetime(clip.get('created_at')) for clip in clips)
+                windows = self._remaining(start, end, times)
+                if windows is None:
+                    # Pages sans ordre de date : rien ne dit quelle période est couverte
+                    can_split = False
+                elif windows:
+                    return windows
+
+            params['after'] = cursor
+
+        return []
+
+    def _remaining(self, start, end, times):
+        """
+        Sous-fenêtres de la partie de [start, end) pas encore couverte par
+        les clips lus (dates times, dans l'ordre des pages), dimensionnées
+        d'après leur densité. Retourne une liste vide s'il vaut mieux
+        continuer la pagination, None si les pages ne sont pas triées par
+        date.
+        """
+        if None in times:
+            return None
+        if times == sorted(times):
+            # Les clips jusqu'à la dernière date lue sont tous vus, elle comprise
+            rest_start, rest_end = times[-1], end
+        elif times == sorted(times, reverse=True):
+            rest_start, rest_end = start, times[-1] + timedelta(seconds=1)
+        else:
+            return None
+        covered = (end - start) - (rest_end - rest_start)
+        rest = rest_end - rest_start
+        if covered <= timedelta(0) or rest < self.min_window * 2:
+            return []
+        expected = len(times) * (rest / covered)
+        parts = min(math.ceil(expected / (self.max_pages * PAGE_SIZE)), int(rest / self.min_window))
+        if parts < 2:
+            return []
+        return self._split(rest_start, rest_end, parts)
+
+    def _add_matches(self, clips, creator_id):
+        with self._lock:
+            if self._on_page:
+                self._on_page(clips)
+            new = []
+            for clip in clips:
+                if clip['id'] in self._seen:
+                    continue
+                if creator_id is None or clip['creator_id'] == creator_id:
+                    self._seen.add(clip['id'])
+                    new.append(clip)
+            if self._on_clips:
+                # Appelé sous le verrou : un consommateur lent ralentit toutes les fenêtres
+                self._on_clips(new)
+            else:
+                for clip in new:
+                    self._matches[clip['id']] = clip
+            if self._limit and len(self._seen) >= self._limit:
+                self.complete = False
+                self._stop.set()
@@ -0,0 +1,142 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from clip_enumerator import to_datetime, format_helix_datetime
+
+
+class ClipIndex:
+    """
+    Index local (SQLite) des métadonnées de clips.
+
+    Les clips sont indexés par id, et chaque chaîne garde la liste des
+    périodes déjà synchronisées : une nouvelle recherche ne récupère
+    auprès de Helix que les périodes manquantes, puis interroge l'index.
+    """
+
+    def __init__(self, db_path='clips.db'):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._create_tables()
+
+    def _create_tables(self):
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS clips (
+                    id TEXT PRIMARY KEY,
+                    broadcaster_id TEXT NOT NULL,
+                    creator_id TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_clips_creator
+                    ON clips (broadcaster_id, creator_id, created_at);
+                CREATE TABLE IF NOT EXISTS sync_ranges (
+                    broadcaster_id TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    ended_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_sync_ranges
+                    ON sync_ranges (broadcaster_id, started_at);
+            """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_clips(self, clips):
+        """Ajoute ou met à jour des clips dans l'index"""
+        rows = [(clip['id'], clip['broadcaster_id'], clip['creator_id'],
+                 clip['created_at'], json.dumps(clip)) for clip in clips]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO clips (id, broadcaster_id, creator_id, created_at, data) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+
+    def get_clips(self, broadcaster_id, creator_id, start_date, end_date, limit=None):
+        """Retourne les clips indexés d'un créateur sur une période"""
+        query = ("SELECT data FROM clips WHERE broadcaster_id = ? AND creator_id = ? "
+                 "AND created_at >= ? AND created_at < ? ORDER BY created_at")
+        params = [broadcaster_id, creator_id,
+                  format_helix_datetime(to_datetime(start_date)),
+                  format_helix_datetime(to_datetime(end_date))]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_clips(self, broadcaster_id, creator_id, start_date, end_date, batch_size=500):
+        """Comme get_clips, mais lit les clips par lots pour ne pas tout charger en mémoire"""
+        query = ("SELECT data, created_at, id FROM clips WHERE broadcaster_id = ? AND creator_id = ? "
+                 "AND created_at < ? AND (created_at > ? OR (created_at = ? AND id > ?)) "
+                 "ORDER BY created_at, id LIMIT ?")
+        end = format_helix_datetime(to_datetime(end_date))
+        # Pagination par clé (date, id) : un id vide inclut les clips de la date de début
+        created_at = format_helix_datetime(to_datetime(start_date))
+        last_id = ''
+        while True:
+            with self._lock:
+                rows = self._conn.execute(query, (broadcaster_id, creator_id, end, created_at,
+                                                  created_at, last_id, batch_size)).fetchall()
+            for row in rows:
+                yield json.loads(row[0])
+            if len(rows) < batch_size:
+                return
+            created_at, last_id = rows[-1][1], rows[-1][2]
+
+    def missing_ranges(self, broadcaster_id, start_date, end_date):
+        """Retourne les périodes [début, fin) pas encore synchronisées pour la chaîne"""
+        start = to_datetime(start_date)
+        end = to_datetime(end_date)
+        missing = []
+        cursor = start
+        for covered_start, covered_end in self._get_ranges(broadcaster_id):
+            if covered_end <= cursor:
+                continue
+            if covered_start >= end:
+                break
+            if covered_start > cursor:
+                missing.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+        if cursor < end:
+            missing.append((cursor, end))
+        return missing
+
+    def mark_synced(self, broadcaster_id, start_date, end_date):
+        """
+        Enregistre une période comme synchronisée. La fin est bornée à
+        l'instant présent : des clips peuvent encore être créés après.
+        """
+        start = to_datetime(start_date)
+        end = min(to_datetime(end_date), datetime.utcnow().replace(microsecond=0))
+        if end <= start:
+            return
+
+        # Fusion avec les périodes qui chevauchent ou touchent la nouvelle
+        ranges = []
+        for covered_start, covered_end in self._get_ranges(broadcaster_id):
+            if covered_end < start or covered_start > end:
+                ranges.append((covered_start, covered_end))
+            else:
+                start = min(start, covered_start)
+                end = max(end, covered_end)
+        ranges.append((start, end))
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sync_ranges WHERE broadcaster_id = ?", (broadcaster_id,))
+            self._conn.executemany(
+                "INSERT INTO sync_ranges (broadcaster_id, started_at, ended_at) VALUES (?, ?, ?)",
+                [(broadcaster_id, format_helix_datetime(s), format_helix_datetime(e))
+                 for s, e in sorted(ranges)])
+
+    def _get_ranges(self, broadcaster_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT started_at, ended_at FROM sync_ranges WHERE broadcaster_id = ? "
+                "ORDER BY started_at", (broadcaster_id,)).fetchall()
+        return [(datetime.strptime(s, '%Y-%m-%dT%H:%M:%SZ'),
+                 datetime.strptime(e, '%Y-%m-%dT%H:%M:%SZ')) for s, e in rows]
@@ -0,0 +1,270 @@
+import hashlib
+import os
+from datetime import datetime
+
+from clip_metadata import MetadataStore
+from download_pool import DownloadCancelled
+from job_journal import JobJournal
+from twitch_downloader import clip_filename
+
+
+class ClipJob:
+    """
+    Job de téléchargement (chaîne, créateur, période), indépendant de Qt.
+
+    Le job prépare le flux de ses clips (journal ou recherche au fil des
+    pages) et compte ses résultats ; les téléchargements sont faits par
+    JobScheduler, qui consomme ce flux pendant la recherche. Les
+    messages texte passent par on_message et les événements structurés
+    par on_event.
+    """
+
+    def __init__(self, channel_name, creator_name, start_date, end_date):
+        self.channel_name = channel_name
+        self.creator_name = creator_name
+        self.start_date = start_date
+        self.end_date = end_date
+        self.bind()
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Crée un job depuis une entrée de manifeste (dates au format
+        AAAA-MM-JJ). Une entrée avec une liste "channels" donne un
+        FanOutJob sur toutes ces chaînes.
+        """
+        start_date = datetime.strptime(data['start'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(data['end'], '%Y-%m-%d').date()
+        if 'channels' in data:
+            return FanOutJob(data['channels'], data['creator'], start_date, end_date)
+        return cls(data['channel'], data['creator'], start_date, end_date)
+
+    @property
+    def output_dir(self):
+        return (f"bulkdownload_{self.channel_name}_{self.creator_name}_"
+                f"{self.start_date.strftime('%d-%m-%Y')}_{self.end_date.strftime('%d-%m-%Y')}")
+
+    def describe(self):
+        return {
+            "channel": self.channel_name,
+            "creator": self.creator_name,
+            "start": self.start_date.isoformat(),
+            "end": self.end_date.isoformat()
+        }
+
+    def logins(self):
+        """Noms des utilisateurs Twitch à résoudre pour ce job"""
+        return [self.channel_name, self.creator_name]
+
+    def bind(self, on_message=None, on_event=None):
+        """Définit les callbacks de messages texte et d'événements structurés"""
+        self.message = on_message or (lambda text: None)
+        self.event = on_event or (lambda data: None)
+
+    def prepare(self, downloader, max_workers=4, index=None):
+        """
+        Prépare le flux des clips à télécharger (attribut stream) : depuis le
+        journal si la recherche y est terminée, sinon par une recherche qui
+        produit les clips au fil des pages. Retourne un dictionnaire
+        d'erreur ou None.
+        """
+        self.journal = JobJournal(self.output_dir)
+        self.metadata = MetadataStore(self.output_dir)
+        self.error = None
+        self.total = len(self.journal.listed)
+        self.successful = len(self.journal.done)
+        self.failed = 0
+        self.processed = self.successful
+
+        if self.journal.clips is not None:
+            self.message(f"Reprise du job: {len(self.journal.done)}/{self.total} clips déjà téléchargés")
+            self.message(f"Nombre total de clips trouvés: {self.total}")
+            self.event({"event": "job_clips", "total": self.total, "remaining": self.total - self.processed})
+            self.stream = self._pending(self.journal.clips)
+            return None
+
+        self.message("Recherche des IDs utilisateurs...")
+        ids = self.resolve(downloader)
+        if not ids:
+            return {"success": False, "message": "Impossible de trouver l'ID de la chaîne ou du créateur"}
+
+        if self.journal.header is None:
+            self.journal.start(**ids)
+        else:
+            self.message(f"Reprise de la recherche: {self.total} clips déjà trouvés")
+
+        self.message("Recherche des clips disponibles...")
+        self.stream = self._search(downloader, ids, max_workers, index)
+        return None
+
+    def resolve(self, downloader):
+        """IDs Twitch de la recherche, enregistrés dans l'en-tête du journal, ou None"""
+        channel_id = downloader.get_user_id(self.channel_name)
+        creator_id = downloader.get_user_id(self.creator_name)
+        if not channel_id or not creator_id:
+            return None
+        return {"channel_id": channel_id, "creator_id": creator_id}
+
+    def find_clips(self, downloader, ids, max_workers=4, index=None):
+        """Générateur des clips de la période, au fil des pages"""
+        return downloader.iter_clips(ids['channel_id'], ids['creator_id'], self.start_date, self.end_date,
+                                     max_workers=max_workers, index=index)
+
+    def _pending(self, clips):
+        for clip in clips:
+            if not self.journal.is_done(clip['id']):
+                yield clip
+
+    def _search(self, downloader, ids, max_workers, index):
+        """Générateur des clips à télécharger : ceux déjà listés par le journal, puis les nouveaux"""
+        listed = {clip['id'] for clip in self.journal.listed}
+        yield from self._pending(self.journal.listed)
+        self.journal.listed = []
+        self.incomplete = False
+
+        clips = self.find_clips(downloader, ids, max_workers, index)
+        try:
+            for clip in clips:
+                if clip['id'] in listed:
+                    continue
+                self.journal.add_clip(clip)
+                self.total += 1
+                yield clip
+        except Exception as e:
+            self.error = {"success": False, "message": str(e)}
+            self.message(f"Erreur lors de la recherche des clips: {e}")
+            return
+        finally:
+            clips.close()
+
+        if not self.total and not self.incomplete:
+            # Rien à reprendre : une prochaine recherche repartira de zéro
+            self.journal.discard()
+            return
+        if self.incomplete:
+            # Recherche à compléter au prochain lancement, les clips trouvés restent dans le journal
+            self.message("Recherche incomplète, elle sera reprise au prochain lancement")
+        else:
+            self.journal.finish()
+        self.message(f"Nombre total de clips trouvés: {self.total}")
+        self.event({"event": "job_clips", "total": self.total, "remaining": self.total - self.processed})
+
+    def record(self, clip, outcome, pool, directory=None):
+        """
+        Enregistre le résultat du téléchargement d'un clip. directory est le
+        dossier du fichier quand il a été placé sur un volume de débordement.
+        """
+        if outcome is True:
+            # Métadonnées écrites avant le journal : un clip peut y figurer
+            # deux fois après un crash, mais aucun n'en manque
+            filename = clip_filename(clip)
+            path = os.path.join(directory or self.output_dir, filename)
+            self.metadata.add(clip, filename if path == os.path.join(self.output_dir, filename) else path,
+                              os.path.getsize(path) if os.path.exists(path) else None)
+            # Journalisé dès la fin du clip, sans attendre les résultats ordonnés
+            self.journal.mark_done(clip['id'])
+            # Compté après les écritures : en cas d'erreur, le clip est enregistré comme échoué
+            self.successful += 1
+            status = "ok"
+        elif isinstance(outcome, DownloadCancelled) or pool.is_cancelled():
+            # Clip interrompu par l'annulation, ni réussi ni échoué
+            return
+        else:
+            self.failed += 1
+            status = "failed"
+            if isinstance(outcome, Exception):
+                self.message(f"Erreur sur le clip {clip['title']}: {outcome}")
+        self.processed += 1
+        self.event({"event": "clip", "clip_id": clip['id'], "status": status,
+                    "processed": self.processed, "total": self.total})
+        self.message(f"Progression totale: {int((self.processed/self.total)*100)}%")
+
+    def close(self):
+        """Ferme les métadonnées du job et les exporte en Parquet si possible"""
+        self.metadata.close()
+
+    def result(self, pool):
+        if pool.is_cancelled():
+            self.message("Téléchargement annulé, les clips en cours ont été interrompus.")
+
+        if self.error:
+            return self.error
+        if not self.total:
+            return {"success": False, "message": "Aucun clip trouvé pour la période spécifiée"}
+
+        return {
+            "success": True,
+            "total": self.total,
+            "successful": self.successful,
+            "failed": self.failed,
+            "output_dir": self.output_dir,
+            "cancelled": pool.is_cancelled()
+        }
+
+
+class FanOutJob(ClipJob):
+    """
+    Job des clips d'un créateur sur plusieurs chaînes, pour une période.
+
+    Les chaînes sont parcourues en parallèle par une seule recherche
+    (TwitchClipDownloader.iter_clips_multi) qui alimente un seul flux de
+    téléchargement. Chaque chaîne terminée produit un événement "channel" ;
+    une chaîne introuvable ou en erreur est signalée sans arrêter les
+    autres, et la recherche reste à compléter au prochain lancement.
+    """
+
+    def __init__(self, channel_names, creator_name, start_date, end_date):
+        self.channel_names = list(dict.fromkeys(channel_names))
+        super().__init__(", ".join(self.channel_names), creator_name, start_date, end_date)
+
+    @property
+    def output_dir(self):
+        # Empreinte de la liste des chaînes : deux listes différentes ne partagent pas un dossier
+        key = ",".join(sorted(name.lower() for name in self.channel_names))
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]
+        return (f"bulkdownload_{len(self.channel_names)}chaines-{digest}_{self.creator_name}_"
+                f"{self.start_date.strftime('%d-%m-%Y')}_{self.end_date.strftime('%d-%m-%Y')}")
+
+    def describe(self):
+        return {
+            "channels": self.channel_names,
+            "creator": self.creator_name,
+            "start": self.start_date.isoformat(),
+            "end": self.end_date.isoformat()
+        }
+
+    def logins(self):
+        return self.channel_names + [self.creator_name]
+
+    def resolve(self, downloader):
+        creator_id = downloader.get_user_id(self.creator_name)
+        channels = {}
+        for name in self.channel_names:
+            channel_id = downloader.get_user_id(name)
+            if channel_id:
+                channels[channel_id] = name
+            else:
+                self.message(f"Chaîne introuvable: {name}")
+                self.event({"event": "channel", "channel": name, "status": "failed",
+                            "message": "Chaîne introuvable"})
+        if not creator_id or not channels:
+            return None
+        return {"channel_ids": channels, "creator_id": creator_id}
+
+    def find_clips(self, downloader, ids, max_workers=4, index=None):
+        channels = ids['channel_ids']
+        if len(channels) < len(self.channel_names):
+            self.incomplete = True
+
+        def on_channel(channel_id, count, error):
+            name = channels[channel_id]
+            if error:
+                self.incomplete = True
+                self.message(f"Erreur lors de la recherche des clips de {name}: {error}")
+                self.event({"event": "channel", "channel": name, "status": "failed", "message": str(error)})
+            else:
+                self.message(f"Recherche terminée sur {name}: {count} clips")
+                self.event({"event": "channel", "channel": name, "status": "ok", "clips": count})
+
+        return downloader.iter_clips_multi(list(channels), ids['creator_id'], self.start_date, self.end_date,
+                                           max_workers=max_workers, index=index, on_channel=on_channel)
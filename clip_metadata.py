@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # Parquet facultatif : sans pyarrow, seul le fichier JSON Lines est écrit
+    pa = None
+
+# Colonnes des métadonnées : champs d'un clip Helix, puis ceux du fichier téléchargé
+FIELDS = (
+    ('id', 'string'),
+    ('title', 'string'),
+    ('url', 'string'),
+    ('broadcaster_id', 'string'),
+    ('broadcaster_name', 'string'),
+    ('creator_id', 'string'),
+    ('creator_name', 'string'),
+    ('game_id', 'string'),
+    ('video_id', 'string'),
+    ('language', 'string'),
+    ('view_count', 'int64'),
+    ('duration', 'float64'),
+    ('vod_offset', 'int64'),
+    ('is_featured', 'bool'),
+    ('thumbnail_url', 'string'),
+    ('created_at', 'timestamp'),
+    ('file', 'string'),
+    ('size', 'int64'),
+    ('downloaded_at', 'timestamp'),
+)
+
+# Lignes par groupe de lignes Parquet, lues et écrites en une fois
+ROW_GROUP_SIZE = 10000
+
+
+def parse_timestamp(value):
+    """Date Helix ("2024-01-05T12:00:00Z") en datetime, None si absente ou illisible"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def arrow_schema():
+    types = {
+        'string': pa.string(),
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'bool': pa.bool_(),
+        'timestamp': pa.timestamp('ms', tz='UTC'),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in FIELDS])
+
+
+class MetadataStore:
+    """
+    Métadonnées des clips téléchargés d'un job, dans son dossier de sortie.
+
+    metadata.jsonl reçoit une ligne par clip terminé (vues, durée, jeu,
+    créateur, dates, fichier...) et n'est complété qu'en fin de fichier.
+    Si pyarrow est installé, les lignes ajoutées depuis le dernier export
+    sont écrites à la fermeture dans un nouveau fichier Parquet de
+    metadata/ : les analyses lisent ce dossier comme un seul jeu de
+    données en colonnes, sans réinterroger Helix. Après un crash, les
+    lignes non exportées le sont à la fermeture suivante.
+
+    Un clip peut apparaître deux fois si le job a été interrompu juste
+    après son enregistrement ; la dernière ligne d'un id fait foi.
+    """
+
+    FILENAME = 'metadata.jsonl'
+    PARQUET_DIR = 'metadata'
+    # Préfixe "_" : ignoré par pyarrow.dataset lors de la lecture du dossier
+    STATE_FILENAME = '_exported.json'
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self.parquet_dir = os.path.join(output_dir, self.PARQUET_DIR)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _open(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        needs_newline = False
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if needs_newline:
+            # Termine la ligne tronquée par un crash pour ne pas corrompre la suivante
+            self._file.write('\n')
+
+    def add(self, clip, filename, size=None):
+        """Ajoute les métadonnées d'un clip téléchargé sous filename dans le dossier du job"""
+        row = {name: clip.get(name) for name, kind in FIELDS[:-3]}
+        row.update({
+            'file': filename,
+            'size': size,
+            'downloaded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        })
+        with self._lock:
+            if self._file is None:
+                self._open()
+            self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+    def close(self):
+        """Ferme le fichier JSON Lines et exporte les nouvelles lignes en Parquet"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if pa is not None:
+            try:
+                self.export_parquet()
+            except Exception as e:
+                print(f"Erreur lors de l'export Parquet des métadonnées: {e}")
+
+    def _exported(self):
+        """Position dans metadata.jsonl jusqu'à laquelle les lignes sont déjà exportées"""
+        try:
+            with open(os.path.join(self.parquet_dir, self.STATE_FILENAME), 'r', encoding='utf-8') as f:
+                return json.load(f)['offset']
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def _read_rows(self, offset):
+        """Lignes de metadata.jsonl depuis offset, par paquets de ROW_GROUP_SIZE ; la position atteinte va dans _end"""
+        rows = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # Ligne tronquée par un crash
+                    continue
+                row['created_at'] = parse_timestamp(row.get('created_at'))
+                row['downloaded_at'] = parse_timestamp(row.get('downloaded_at'))
+                rows.append(row)
+                if len(rows) >= ROW_GROUP_SIZE:
+                    yield rows
+                    rows = []
+            if rows:
+                yield rows
+            self._end = f.tell()
+
+    def export_parquet(self):
+        """
+        Écrit les lignes pas encore exportées dans metadata/part-NNNNN.parquet.
+        Le fichier n'apparaît qu'une fois complet. Retourne son chemin, ou
+        None s'il n'y avait rien à exporter.
+        """
+        if pa is None:
+            raise RuntimeError("pyarrow n'est pas installé")
+        if not os.path.exists(self.path):
+            return None
+        offset = self._exported()
+        if offset >= os.path.getsize(self.path):
+            return None
+
+        os.makedirs(self.parquet_dir, exist_ok=True)
+        parts = [name for name in os.listdir(self.parquet_dir) if name.endswith('.parquet')]
+        path = os.path.join(self.parquet_dir, f"part-{len(parts) + 1:05d}.parquet")
+        tmp_path = path + '.tmp'
+        schema = arrow_schema()
+        writer = None
+        self._end = offset
+        try:
+            for rows in self._read_rows(offset):
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, schema)
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            if writer is not None:
+                writer.close()
+                os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                if writer is not None:
+                    writer.close()
+                os.remove(tmp_path)
+
+        state_path = os.path.join(self.parquet_dir, self.STATE_FILENAME)
+        with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'offset': self._end}, f)
+        os.replace(state_path + '.tmp', state_path)
+        return path if writer is not None else None
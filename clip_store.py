@@ -0,0 +1,144 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows : pas de reflink, les liens physiques et la copie restent possibles
+    fcntl = None
+
+# ioctl Linux de clonage de fichier (reflink) sur btrfs, XFS...
+FICLONE = 0x40049409
+
+
+def reflink(source, destination):
+    """Crée une copie légère (reflink) partageant les blocs de source"""
+    if fcntl is None:
+        raise OSError("reflink non disponible sur ce système")
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def link_or_copy(source, destination):
+    """
+    Crée un lien physique vers source, à défaut un reflink, et en dernier
+    recours une copie si le système de fichiers ne permet ni l'un ni l'autre.
+    """
+    if os.path.exists(destination):
+        return
+    os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+    try:
+        os.link(source, destination)
+        return
+    except OSError:
+        pass
+    try:
+        reflink(source, destination)
+    except OSError:
+        if os.path.exists(destination):
+            os.remove(destination)
+        shutil.copy2(source, destination)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ClipStore:
+    """
+    Stockage partagé des clips, adressé par contenu.
+
+    Chaque fichier est rangé une seule fois sous objects/ selon son
+    empreinte SHA-256, et une base SQLite associe l'id du clip à cette
+    empreinte. Les dossiers des jobs ne contiennent que des liens physiques
+    (ou des reflinks) vers ces objets : un clip déjà téléchargé par un autre
+    job n'est ni retéléchargé ni dupliqué sur le disque. Le stockage doit
+    être sur le même volume que les dossiers de téléchargement pour que
+    les liens soient possibles.
+    """
+
+    def __init__(self, root='clip_store'):
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, 'store.db'), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS clips (
+                    id TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def object_path(self, sha256):
+        return os.path.join(self.root, 'objects', sha256[:2], f'{sha256}.mp4')
+
+    def lookup(self, clip_id):
+        """Retourne le chemin de l'objet d'un clip déjà stocké, ou None"""
+        with self._lock:
+            row = self._conn.execute("SELECT sha256, size FROM clips WHERE id = ?", (clip_id,)).fetchone()
+        if not row:
+            return None
+        path = self.object_path(row[0])
+        # Un objet supprimé ou tronqué à la main n'est plus utilisable
+        if not os.path.exists(path) or os.path.getsize(path) != row[1]:
+            return None
+        return path
+
+    def add(self, clip_id, filepath, sha256=None):
+        """
+        Range un fichier téléchargé dans le stockage. Si un objet de même
+        contenu existe déjà, le fichier est remplacé par un lien vers lui.
+        sha256 évite de relire le fichier si son empreinte est déjà connue.
+        Retourne le chemin de l'objet.
+        """
+        sha256 = sha256 or file_sha256(filepath)
+        size = os.path.getsize(filepath)
+        path = self.object_path(sha256)
+
+        if not os.path.exists(path):
+            # Passage par un fichier temporaire : deux clips de même contenu
+            # peuvent être rangés en même temps
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            link_or_copy(filepath, tmp_path)
+            os.replace(tmp_path, path)
+        elif not os.path.samefile(path, filepath):
+            tmp_path = filepath + '.link'
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            try:
+                os.link(path, tmp_path)
+                os.replace(tmp_path, filepath)
+            except OSError:
+                # Volumes différents : le fichier du job est conservé tel quel
+                pass
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO clips (id, sha256, size, stored_at) VALUES (?, ?, ?, ?)",
+                (clip_id, sha256, size, time.time()))
+        return path
+
+    def materialize(self, clip_id, destination):
+        """Place un clip stocké à destination. Retourne False s'il n'est pas dans le stockage"""
+        path = self.lookup(clip_id)
+        if not path:
+            return False
+        link_or_copy(path, destination)
+        return True
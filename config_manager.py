@@ -2,11 +2,34 @@ import json
 import os
 
 class ConfigManager:
-    def __init__(self):
-        self.config_file = 'config.json'
+    def __init__(self, config_file='config.json'):
+        self.config_file = config_file
         self.default_config = {
             'client_id': '',
-            'client_secret': ''
+            'client_secret': '',
+            'max_workers': 4,
+            'max_connections_per_host': 4,
+            'index_path': 'clips.db',
+            'async_downloads': False,
+            'async_concurrency': 100,
+            'user_cache_path': 'users_cache.json',
+            'token_cache_path': 'token_cache.json',
+            'metrics_path': '',
+            'store_path': 'clip_store',
+            'max_height': 0,
+            'max_fps': 0,
+            'max_bitrate': 0,
+            'preflight': False,
+            'http_pool_size': 32,
+            'http2': False,
+            'dns_cache_ttl': 300,
+            'postprocess': [],
+            'postprocess_workers': 0,
+            'max_bandwidth': 0,
+            'job_bandwidth': 0,
+            'bandwidth_schedule': [],
+            'overflow_dirs': [],
+            'min_free_space': 500
         }
         self.config = self.load_config()
 
@@ -39,6 +62,98 @@ class ConfigManager:
         """Récupère le Client Secret"""
         return self.config.get('client_secret', '')
 
+    def get_max_workers(self):
+        """Récupère le nombre de téléchargements simultanés"""
+        return self.config.get('max_workers', self.default_config['max_workers'])
+
+    def get_max_connections_per_host(self):
+        """Récupère le nombre maximal de connexions par hôte"""
+        return self.config.get('max_connections_per_host', self.default_config['max_connections_per_host'])
+
+    def get_index_path(self):
+        """Récupère le chemin de l'index local des clips (vide pour le désactiver)"""
+        return self.config.get('index_path', self.default_config['index_path'])
+
+    def get_async_downloads(self):
+        """Indique si les téléchargements passent par le moteur asyncio"""
+        return self.config.get('async_downloads', self.default_config['async_downloads'])
+
+    def get_async_concurrency(self):
+        """Récupère le nombre maximal de clips simultanés en mode asyncio"""
+        return self.config.get('async_concurrency', self.default_config['async_concurrency'])
+
+    def get_user_cache_path(self):
+        """Récupère le chemin du cache des IDs utilisateurs (vide pour le désactiver)"""
+        return self.config.get('user_cache_path', self.default_config['user_cache_path'])
+
+    def get_token_cache_path(self):
+        """Récupère le chemin du cache du token OAuth (vide pour le désactiver)"""
+        return self.config.get('token_cache_path', self.default_config['token_cache_path'])
+
+    def get_metrics_path(self):
+        """Récupère le fichier d'export des métriques (.prom ou JSON Lines, vide pour désactiver)"""
+        return self.config.get('metrics_path', self.default_config['metrics_path'])
+
+    def get_store_path(self):
+        """Récupère le dossier du stockage partagé des clips (vide pour le désactiver)"""
+        return self.config.get('store_path', self.default_config['store_path'])
+
+    def get_max_height(self):
+        """Récupère la hauteur maximale des clips téléchargés, par exemple 720 (0 pour la qualité source)"""
+        return self.config.get('max_height', self.default_config['max_height'])
+
+    def get_max_fps(self):
+        """Récupère le nombre maximal d'images par seconde des clips téléchargés (0 sans limite)"""
+        return self.config.get('max_fps', self.default_config['max_fps'])
+
+    def get_max_bitrate(self):
+        """Récupère le débit maximal des clips téléchargés en kbit/s (0 sans limite)"""
+        return self.config.get('max_bitrate', self.default_config['max_bitrate'])
+
+    def get_preflight(self):
+        """Indique si la taille des clips est vérifiée par une requête HEAD avant leur téléchargement"""
+        return self.config.get('preflight', self.default_config['preflight'])
+
+    def get_http_pool_size(self):
+        """Récupère le nombre de connexions HTTP gardées ouvertes par hôte"""
+        return self.config.get('http_pool_size', self.default_config['http_pool_size'])
+
+    def get_http2(self):
+        """Indique si les requêtes GQL et HEAD passent en HTTP/2 (nécessite httpx[http2])"""
+        return self.config.get('http2', self.default_config['http2'])
+
+    def get_dns_cache_ttl(self):
+        """Récupère la durée de conservation des résolutions DNS en secondes (0 pour désactiver)"""
+        return self.config.get('dns_cache_ttl', self.default_config['dns_cache_ttl'])
+
+    def get_postprocess(self):
+        """Récupère les étapes de post-traitement des clips (faststart, thumbnail, checksum)"""
+        return self.config.get('postprocess', self.default_config['postprocess'])
+
+    def get_postprocess_workers(self):
+        """Récupère le nombre de processus de post-traitement (0 pour un par cœur)"""
+        return self.config.get('postprocess_workers', self.default_config['postprocess_workers'])
+
+    def get_max_bandwidth(self):
+        """Récupère le débit maximal de tous les téléchargements en Mo/s (0 sans limite)"""
+        return self.config.get('max_bandwidth', self.default_config['max_bandwidth'])
+
+    def get_job_bandwidth(self):
+        """Récupère le débit maximal de chaque job en Mo/s (0 sans limite)"""
+        return self.config.get('job_bandwidth', self.default_config['job_bandwidth'])
+
+    def get_bandwidth_schedule(self):
+        """Récupère les plages horaires de limitation du débit"""
+        return self.config.get('bandwidth_schedule', self.default_config['bandwidth_schedule'])
+
+    def get_overflow_dirs(self):
+        """Récupère les dossiers utilisés quand le disque du dossier courant est plein"""
+        return self.config.get('overflow_dirs', self.default_config['overflow_dirs'])
+
+    def get_min_free_space(self):
+        """Récupère l'espace à laisser libre sur chaque disque en Mo (0 sans vérification)"""
+        return self.config.get('min_free_space', self.default_config['min_free_space'])
+
     def set_credentials(self, client_id, client_secret):
         """Définit les credentials Twitch"""
         self.config['client_id'] = client_id
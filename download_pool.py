@@ -0,0 +1,120 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class DownloadCancelled(Exception):
+    """Levée lorsqu'un téléchargement est interrompu par une annulation"""
+    pass
+
+
+class DownloadPool:
+    """
+    Pool de workers borné pour télécharger plusieurs clips en parallèle.
+
+    Limite le nombre de connexions simultanées par hôte, restitue les
+    résultats dans l'ordre des clips et permet une annulation immédiate
+    des téléchargements en cours.
+    """
+
+    def __init__(self, max_workers=4, max_per_host=4):
+        self.max_workers = max(1, int(max_workers))
+        self.max_per_host = max(1, int(max_per_host))
+        self._cancel_event = threading.Event()
+        self._host_lock = threading.Lock()
+        self._host_slots = {}
+        # Métriques optionnelles, mises à jour avec le nombre de tâches en attente
+        self.metrics = None
+
+    def cancel(self):
+        """Demande l'arrêt de tous les téléchargements"""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _get_host_slot(self, host):
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    @contextmanager
+    def host_slot(self, url):
+        """Réserve une connexion vers l'hôte de l'URL donnée"""
+        slot = self._get_host_slot(urlparse(url).netloc)
+        # Attente par petits pas pour rester réactif à l'annulation
+        while not slot.acquire(timeout=0.5):
+            if self.is_cancelled():
+                raise DownloadCancelled()
+        try:
+            yield
+        finally:
+            slot.release()
+
+    @contextmanager
+    def extra_host_slots(self, url, wanted):
+        """
+        Réserve sans attendre jusqu'à wanted connexions supplémentaires vers
+        l'hôte de l'URL et produit le nombre obtenu (éventuellement 0).
+        """
+        slot = self._get_host_slot(urlparse(url).netloc)
+        acquired = 0
+        while acquired < wanted and slot.acquire(blocking=False):
+            acquired += 1
+        try:
+            yield acquired
+        finally:
+            for _ in range(acquired):
+                slot.release()
+
+    def map(self, task, items):
+        """
+        Exécute task(item) pour chaque élément et génère des tuples
+        (index, item, résultat) dans l'ordre d'origine des éléments.
+        Une exception levée par task est renvoyée comme résultat. items
+        peut être un générateur : il n'est consommé qu'au fur et à mesure
+        que des workers se libèrent.
+        """
+        completed = {}
+        submitted = {}
+        next_index = 0
+        total = len(items) if hasattr(items, '__len__') else None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+            item_iter = iter(enumerate(items))
+
+            def submit_next():
+                for index, item in item_iter:
+                    if self.is_cancelled():
+                        return
+                    submitted[index] = item
+                    pending[executor.submit(self._run_task, task, item)] = index
+                    if self.metrics and total is not None:
+                        self.metrics.set_queue_depth(total - index - 1)
+                    return
+
+            # On ne soumet que quelques tâches d'avance pour pouvoir annuler vite
+            for _ in range(self.max_workers * 2):
+                submit_next()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    completed[index] = future.result()
+                    submit_next()
+
+                while next_index in completed:
+                    yield next_index, submitted.pop(next_index), completed.pop(next_index)
+                    next_index += 1
+
+    def _run_task(self, task, item):
+        if self.is_cancelled():
+            return DownloadCancelled()
+        try:
+            return task(item)
+        except Exception as e:
+            return e
@@ -0,0 +1,225 @@
+import threading
+import time
+from collections import deque
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QAbstractTableModel, QModelIndex, QTimer
+from PyQt6.QtWidgets import (QApplication, QListView, QTableView, QHeaderView, QStyle,
+                             QStyleOptionProgressBar, QStyledItemDelegate, QAbstractItemView)
+
+# Lignes de log gardées en mémoire, les plus anciennes sont oubliées
+LOG_LIMIT = 5000
+
+# Intervalle de rafraîchissement de l'interface (en millisecondes)
+REFRESH_INTERVAL = 100
+
+# Un téléchargement sans nouvelles depuis ce délai (en secondes) quitte le tableau
+STALE_AFTER = 5.0
+
+
+class ProgressHub:
+    """
+    Point de collecte des événements de progression des threads de
+    téléchargement, sans signal Qt par événement.
+
+    Les workers ne font qu'enregistrer le dernier état sous un verrou ;
+    l'interface le récupère à intervalle fixe (drain). Quelle que soit la
+    fréquence des événements, l'interface n'est donc rafraîchie que
+    quelques fois par seconde.
+    """
+
+    def __init__(self, log_limit=LOG_LIMIT):
+        self._lock = threading.Lock()
+        self._lines = deque(maxlen=log_limit)
+        self._downloads = {}
+        self._overall = None
+        self._metrics = None
+
+    def log(self, message):
+        with self._lock:
+            self._lines.append(message)
+
+    def download(self, current, total, filename):
+        worker = threading.current_thread().name
+        with self._lock:
+            previous = self._downloads.get(filename)
+            self._downloads[filename] = (previous[0] if previous else worker, current, total)
+
+    def overall(self, processed, total):
+        with self._lock:
+            self._overall = (processed, total)
+
+    def metrics(self, snapshot):
+        with self._lock:
+            self._metrics = snapshot
+
+    def drain(self):
+        """Retourne et oublie les lignes, téléchargements, progression globale et métriques reçus"""
+        with self._lock:
+            lines = list(self._lines)
+            self._lines.clear()
+            downloads, self._downloads = self._downloads, {}
+            overall, self._overall = self._overall, None
+            metrics, self._metrics = self._metrics, None
+        return lines, downloads, overall, metrics
+
+
+class LogModel(QAbstractListModel):
+    """Lignes de log dans un tampon circulaire de log_limit lignes, affichées par un QListView"""
+
+    def __init__(self, log_limit=LOG_LIMIT, parent=None):
+        super().__init__(parent)
+        self._lines = deque(maxlen=log_limit)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._lines)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and index.isValid():
+            return self._lines[index.row()]
+        return None
+
+    def append_lines(self, lines):
+        if not lines:
+            return
+        overflow = len(self._lines) + len(lines) - self._lines.maxlen
+        if overflow > 0:
+            removed = min(overflow, len(self._lines))
+            self.beginRemoveRows(QModelIndex(), 0, removed - 1)
+            for _ in range(removed):
+                self._lines.popleft()
+            self.endRemoveRows()
+            lines = lines[-self._lines.maxlen:]
+        first = len(self._lines)
+        self.beginInsertRows(QModelIndex(), first, first + len(lines) - 1)
+        self._lines.extend(lines)
+        self.endInsertRows()
+
+
+class WorkerTableModel(QAbstractTableModel):
+    """Téléchargements en cours : worker, clip, progression et taille"""
+
+    HEADERS = ("Worker", "Clip", "Progression", "Taille")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # [worker, fichier, octets reçus, taille, dernière mise à jour]
+        self._rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        worker, filename, current, total, updated = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return worker
+            if column == 1:
+                return filename
+            if column == 2:
+                return int((current / total) * 100) if total > 0 else 0
+            if column == 3:
+                return f"{current / 1048576:.1f} / {total / 1048576:.1f} Mo"
+        return None
+
+    def update(self, downloads):
+        """Met à jour les lignes d'après ProgressHub.drain, retire les téléchargements finis ou inactifs"""
+        now = time.monotonic()
+        positions = {row[1]: i for i, row in enumerate(self._rows)}
+        for filename, (worker, current, total) in downloads.items():
+            if filename in positions:
+                row = self._rows[positions[filename]]
+                row[2:] = [current, total, now]
+                first = self.index(positions[filename], 2)
+                self.dataChanged.emit(first, self.index(positions[filename], 3))
+            else:
+                self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows))
+                self._rows.append([worker.rsplit('_', 1)[-1], filename, current, total, now])
+                self.endInsertRows()
+
+        for i in reversed(range(len(self._rows))):
+            worker, filename, current, total, updated = self._rows[i]
+            if (total and current >= total) or now - updated > STALE_AFTER:
+                self.beginRemoveRows(QModelIndex(), i, i)
+                del self._rows[i]
+                self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self.endResetModel()
+
+
+class ProgressBarDelegate(QStyledItemDelegate):
+    """Dessine la colonne de progression comme une barre de progression"""
+
+    def paint(self, painter, option, index):
+        bar = QStyleOptionProgressBar()
+        bar.rect = option.rect.adjusted(2, 2, -2, -2)
+        bar.minimum = 0
+        bar.maximum = 100
+        bar.progress = index.data() or 0
+        bar.text = f"{bar.progress}%"
+        bar.textVisible = True
+        QApplication.style().drawControl(QStyle.ControlElement.CE_ProgressBar, bar, painter)
+
+
+class ProgressPanel:
+    """
+    Liste de logs virtualisée et tableau des téléchargements en cours,
+    rafraîchis par un QTimer à partir d'un ProgressHub. on_overall et
+    on_metrics reçoivent la dernière progression globale et les dernières
+    métriques reçues depuis le rafraîchissement précédent.
+    """
+
+    def __init__(self, hub, on_overall=None, on_metrics=None, interval=REFRESH_INTERVAL):
+        self.hub = hub
+        self.on_overall = on_overall
+        self.on_metrics = on_metrics
+
+        self.log_model = LogModel()
+        self.log_view = QListView()
+        self.log_view.setModel(self.log_model)
+        # Hauteur de ligne fixe : seules les lignes visibles sont mesurées
+        self.log_view.setUniformItemSizes(True)
+        self.log_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+
+        self.worker_model = WorkerTableModel()
+        self.worker_view = QTableView()
+        self.worker_view.setModel(self.worker_model)
+        self.worker_view.setItemDelegateForColumn(2, ProgressBarDelegate(self.worker_view))
+        self.worker_view.verticalHeader().setVisible(False)
+        self.worker_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        header = self.worker_view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+
+        self.timer = QTimer()
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+    def refresh(self):
+        lines, downloads, overall, metrics = self.hub.drain()
+        if lines:
+            # Défilement automatique seulement si la fin de la liste était affichée
+            scrollbar = self.log_view.verticalScrollBar()
+            at_bottom = scrollbar.value() >= scrollbar.maximum()
+            self.log_model.append_lines(lines)
+            if at_bottom:
+                self.log_view.scrollToBottom()
+        self.worker_model.update(downloads)
+        if overall and self.on_overall:
+            self.on_overall(*overall)
+        if metrics and self.on_metrics:
+            self.on_metrics(metrics)
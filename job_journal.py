@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+
+
+class JobJournal:
+    """
+    Journal d'un job de téléchargement, stocké dans le dossier de sortie.
+
+    Le fichier est en JSON Lines et uniquement complété en fin de fichier :
+    la première ligne décrit le job, les suivantes les clips trouvés au fil
+    de la recherche, la fin de la recherche et les clips terminés. Une
+    ligne tronquée par un crash est ignorée à la relecture, ce qui permet
+    de reprendre le job sans refaire la recherche ni retélécharger les
+    clips terminés.
+
+    Les anciens journaux, dont la première ligne contient directement la
+    liste complète des clips, restent lisibles.
+    """
+
+    FILENAME = '.journal.jsonl'
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self._lock = threading.Lock()
+        self.header = None
+        self.listed = []
+        self.complete = False
+        self.done = set()
+        self._needs_newline = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Ligne incomplète après un crash
+                    continue
+                if 'header' in entry:
+                    self.header = entry
+                elif 'clips' in entry:
+                    self.header = entry
+                    self.listed = entry['clips']
+                    self.complete = True
+                elif 'clip' in entry:
+                    self.listed.append(entry['clip'])
+                elif 'complete' in entry:
+                    self.complete = True
+                elif 'done' in entry:
+                    self.done.add(entry['done'])
+        # Termine une éventuelle ligne tronquée pour ne pas corrompre la suivante
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                self._needs_newline = f.read(1) != b'\n'
+
+    @property
+    def clips(self):
+        """Liste des clips du job si la recherche est terminée, sinon None"""
+        return self.listed if self.header and self.complete else None
+
+    def start(self, **info):
+        """Démarre un nouveau journal, les clips sont ajoutés au fil de la recherche"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.header = dict(info, header=True)
+        self.listed = []
+        self.complete = False
+        self.done = set()
+        self._needs_newline = False
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.header) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _append(self, entry, sync=True):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                if self._needs_newline:
+                    f.write('\n')
+                    self._needs_newline = False
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+
+    def add_clip(self, clip):
+        """
+        Ajoute un clip trouvé. Il n'est pas gardé en mémoire, et la ligne
+        est synchronisée sur le disque avec le prochain mark_done.
+        """
+        self._append({'clip': clip}, sync=False)
+
+    def finish(self):
+        """Indique que la recherche est terminée : tous les clips sont listés"""
+        self.complete = True
+        self._append({'complete': True})
+
+    def discard(self):
+        """Supprime le journal, et le dossier du job s'il est resté vide"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        directory = os.path.dirname(self.path)
+        if directory and os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+        self.header = None
+
+    def mark_done(self, clip_id):
+        with self._lock:
+            self.done.add(clip_id)
+        self._append({'done': clip_id})
+
+    def is_done(self, clip_id):
+        return clip_id in self.done
@@ -0,0 +1,496 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice, zip_longest
+
+from async_downloader import AsyncTwitchClipDownloader
+from clip_index import ClipIndex
+from clip_store import ClipStore, link_or_copy
+from download_pool import DownloadCancelled
+from output_manager import estimate_size
+from postprocess import PostProcessor, sidecars
+from preflight import Preflight
+from twitch_downloader import GQL_BATCH_SIZE, clip_filename
+
+
+def batched(iterable, max_size):
+    """
+    Regroupe les éléments d'un itérable en listes de taille croissante
+    (1, 2, 4... jusqu'à max_size) : les premiers éléments partent sans
+    attendre qu'un lot complet soit disponible.
+    """
+    iterator = iter(iterable)
+    size = 1
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+        size = min(size * 2, max_size)
+
+
+class JobScheduler:
+    """
+    File de jobs (chaîne, créateur, période) exécutés ensemble.
+
+    Tous les jobs partagent la même session Twitch, le même pool de
+    téléchargement et le même index de clips : les périodes qui se
+    chevauchent ne sont parcourues qu'une fois, et un clip présent dans
+    plusieurs jobs n'est téléchargé qu'une fois puis lié dans les autres
+    dossiers. Les clips des différents jobs sont entrelacés pour que chaque
+    job avance au même rythme.
+
+    Avec un stockage partagé (store_path), les clips déjà téléchargés lors
+    d'exécutions précédentes, quel que soit le job, sont liés depuis le
+    stockage au lieu d'être retéléchargés.
+
+    Avec la vérification préalable (preflight), ou dès qu'une limite de
+    débit est configurée, la taille de chaque clip est demandée au CDN
+    avant son téléchargement : la qualité est choisie d'après le débit et
+    les fichiers trop petits pour être valides ne sont pas téléchargés.
+
+    Les étapes de post-traitement (postprocess, voir postprocess.py) sont
+    exécutées dans un pool de processus après chaque téléchargement ; un
+    clip n'est compté comme terminé, et rangé dans le stockage, qu'une
+    fois traité.
+
+    Un BandwidthScheduler (bandwidth) limite le débit de tous les flux et
+    de chaque job ; un clip commun à plusieurs jobs compte pour le premier.
+
+    Un OutputManager (outputs) réserve l'espace disque de chaque clip avant
+    son téléchargement et place le clip sur un volume de débordement quand
+    le premier est plein ; la file est mise en pause quand plus aucun n'a
+    de place. La taille prévue vient de la vérification préalable si elle
+    est active, sinon de la durée du clip, et la réservation est corrigée
+    d'après la réponse du CDN avant l'écriture. Les clips placés sur un
+    autre volume que le stockage partagé n'y sont pas rangés.
+    """
+
+    def __init__(self, downloader, pool, index_path=None, use_async=False, async_concurrency=100,
+                 store_path=None, preflight=False, postprocess=(), postprocess_workers=None,
+                 bandwidth=None, outputs=None):
+        self.downloader = downloader
+        self.pool = pool
+        self.index_path = index_path
+        self.store_path = store_path
+        self.use_async = use_async
+        self.async_concurrency = async_concurrency
+        self.jobs = []
+        self.postprocess = tuple(postprocess)
+        self.bandwidth = bandwidth
+        self.outputs = outputs if outputs and outputs.enabled else None
+        self.postprocess_workers = postprocess_workers
+        self._postprocessor = None
+        if preflight or downloader.quality_policy.max_bitrate:
+            self.preflight = Preflight(downloader, pool.max_workers * 2)
+        else:
+            self.preflight = None
+        # Le pool met à jour la profondeur de file dans les métriques du téléchargeur
+        if getattr(pool, 'metrics', None) is None:
+            pool.metrics = downloader.metrics
+
+    def add(self, job):
+        """Ajoute un job à la file. Retourne False si un job identique y est déjà"""
+        key = job.describe()
+        if any(existing.describe() == key for existing in self.jobs):
+            return False
+        self.jobs.append(job)
+        return True
+
+    def run(self, on_message=None, on_download=None, on_event=None):
+        """
+        Exécute tous les jobs de la file. on_message et on_event reçoivent
+        en plus du message/événement le job concerné. Retourne la liste des
+        résultats, dans l'ordre des jobs.
+
+        Les téléchargements commencent dès les premières pages de la
+        recherche : les clips passent des jobs aux workers par un flux
+        borné, sans que la liste complète soit construite en mémoire.
+        """
+        message = on_message or (lambda job, text: None)
+        event = on_event or (lambda job, data: None)
+
+        results = {}
+        ready = []
+        # Clips en cours de téléchargement -> jobs qui les attendent, et
+        # clips terminés pendant l'exécution -> (réussi, premier job)
+        self._owners = {}
+        self._finished = {}
+        self._reused = {}
+        # Clips placés sur une destination de débordement -> destination
+        self._roots = {}
+        self._lock = threading.Lock()
+        # En mode asynchrone, les jobs sont mis à jour depuis deux threads
+        self._record_lock = threading.Lock()
+
+        # Tous les logins des jobs sont résolus en une fois, les jobs lisent ensuite le cache
+        logins = [name for job in self.jobs for name in job.logins()]
+        self.downloader.get_user_ids(logins)
+
+        # Sans index configuré, un index en mémoire sert à partager les
+        # périodes déjà parcourues entre les jobs de cette exécution
+        index = ClipIndex(self.index_path or ':memory:')
+        store = ClipStore(self.store_path) if self.store_path else None
+        if self.postprocess:
+            self._postprocessor = PostProcessor(self.postprocess, self.postprocess_workers)
+        try:
+            for job in self.jobs:
+                job.bind(lambda text, job=job: message(job, text),
+                         lambda data, job=job: event(job, data))
+                try:
+                    error = job.prepare(self.downloader, self.pool.max_workers, index)
+                except Exception as e:
+                    error = {"success": False, "message": str(e)}
+                if error:
+                    results[id(job)] = error
+                else:
+                    ready.append(job)
+
+            stream = self._stream(ready, store)
+            if self.use_async:
+                asyncio.run(self._download_async(stream, on_download, store))
+            else:
+                def download(item):
+                    clip, download_url, size = item
+                    first = self._owners[clip['id']][0]
+                    try:
+                        # Bloque tant qu'aucune destination n'a la place du clip
+                        self._admit(clip, first, size)
+                        first.message(f"Traitement du clip: {clip['title']}")
+                        outcome = self.downloader.download_clip(
+                            clip, self._clip_dir(clip, first), on_download,
+                            pool=self.pool,
+                            download_url=download_url,
+                            throttle=self._throttle(first),
+                            on_size=self._on_size(clip))
+                    except Exception as e:
+                        outcome = e
+                    finally:
+                        self._release(clip)
+                    # Empreinte, post-traitement et journal dans le worker, dès
+                    # la fin du clip : un clip lent ne retarde pas les suivants.
+                    # Quand le pool de processus est saturé, le worker attend
+                    # au lieu de télécharger d'autres clips.
+                    self._finish(clip, outcome, store)
+
+                for i, (clip, download_url, size), outcome in self.pool.map(download, self._resolve(stream)):
+                    if outcome is not None:
+                        # Clip annulé avant d'avoir atteint un worker
+                        self._record(clip, outcome)
+        finally:
+            if self._postprocessor:
+                # Les derniers clips sont enregistrés à la fin de leur post-traitement
+                self._postprocessor.shutdown()
+                self._postprocessor = None
+            for job in ready:
+                job.close()
+            if store:
+                store.close()
+            index.close()
+
+        for job in ready:
+            results[id(job)] = job.result(self.pool)
+
+        return [results[id(job)] for job in self.jobs]
+
+    def _stream(self, jobs, store):
+        """
+        Générateur des clips à télécharger, au fil de la recherche des jobs.
+
+        Les jobs d'une même chaîne sont parcourus l'un après l'autre, pour
+        que chacun profite des périodes déjà synchronisées dans l'index par
+        le précédent ; les différentes chaînes sont entrelacées pour que
+        chaque job avance au même rythme. Un clip déjà présent dans le
+        stockage, déjà téléchargé ou en cours pour un autre job n'est pas
+        produit une seconde fois.
+        """
+        channels = {}
+        for job in jobs:
+            channels.setdefault(job.channel_name.lower(), []).append(job)
+
+        def lane(channel_jobs):
+            for job in channel_jobs:
+                for clip in job.stream:
+                    yield job, clip
+
+        try:
+            for row in zip_longest(*(lane(channel_jobs) for channel_jobs in channels.values())):
+                for entry in row:
+                    if self.pool.is_cancelled():
+                        return
+                    if entry is None:
+                        continue
+                    job, clip = entry
+                    if self._assign(job, clip, store):
+                        yield clip
+        finally:
+            for job in jobs:
+                count = self._reused.pop(id(job), 0)
+                if count:
+                    job.message(f"{count} clips repris du stockage partagé")
+
+    def _assign(self, job, clip, store):
+        """Rattache un clip trouvé par job. Retourne True s'il faut le télécharger"""
+        clip_id = clip['id']
+        with self._lock:
+            if clip_id in self._owners:
+                # Déjà en cours pour un autre job : lié à la fin du téléchargement
+                self._owners[clip_id].append(job)
+                return False
+            finished = self._finished.get(clip_id)
+
+        if finished:
+            success, first = finished
+            if success:
+                self._link(clip, first, job)
+            with self._record_lock:
+                job.record(clip, success, self.pool, self._clip_dir(clip, job))
+            return False
+
+        if store and store.materialize(clip_id, self.downloader.clip_path(clip, job.output_dir)):
+            self._reused[id(job)] = self._reused.get(id(job), 0) + 1
+            if self._postprocessor:
+                # Miniature et empreinte du clip repris ; il est déjà enregistré
+                future = self._postprocessor.submit(self.downloader.clip_path(clip, job.output_dir))
+                future.add_done_callback(lambda f: self._postprocess_result(clip, [job], f))
+            with self._record_lock:
+                job.record(clip, True, self.pool)
+            return False
+
+        with self._lock:
+            self._owners[clip_id] = [job]
+        return True
+
+    def _resolve(self, stream):
+        """Résout les URLs de téléchargement, et leurs tailles, par lots GQL au fil du flux"""
+        for batch in batched(stream, GQL_BATCH_SIZE):
+            source_urls, sizes, rejected = self._choose_urls(batch)
+            for clip in batch:
+                if clip['id'] in rejected:
+                    self._record(clip, rejected[clip['id']])
+                else:
+                    yield clip, source_urls.get(clip['id']), sizes.get(clip['id'], 0)
+
+    def _choose_urls(self, batch):
+        """
+        Retourne les URLs des clips du lot, leurs tailles annoncées ({id:
+        octets}, vide sans vérification préalable) et les clips à ne pas
+        télécharger ({id: erreur}), ceux dont la vérification préalable
+        annonce un fichier invalide.
+        """
+        if not self.preflight:
+            return self.downloader.get_clip_source_urls([clip['id'] for clip in batch]), {}, {}
+
+        estimates = self.preflight.resolve(batch)
+        source_urls = {clip_id: estimate.url for clip_id, estimate in estimates.items() if estimate.url}
+        sizes = {clip_id: estimate.size for clip_id, estimate in estimates.items()}
+        rejected = {clip_id: ValueError(f"fichier de {estimate.size} octets annoncé, clip invalide")
+                    for clip_id, estimate in estimates.items() if estimate.too_small}
+        return source_urls, sizes, rejected
+
+    def _record(self, clip, outcome):
+        """
+        Lie le clip téléchargé dans les dossiers des autres jobs et enregistre
+        le résultat. Ne lève pas d'exception : appelé depuis les workers et
+        les callbacks de post-traitement, où une erreur serait perdue et le
+        clip jamais compté, un lien ou une écriture en erreur fait échouer
+        le clip pour le job concerné.
+        """
+        with self._lock:
+            jobs = self._owners.pop(clip['id'])
+            self._finished[clip['id']] = (outcome is True, jobs[0])
+        outcomes = {id(job): outcome for job in jobs}
+        if outcome is True:
+            for other in jobs[1:]:
+                try:
+                    self._link(clip, jobs[0], other)
+                except Exception as e:
+                    outcomes[id(other)] = e
+        with self._record_lock:
+            for job in jobs:
+                try:
+                    job.record(clip, outcomes[id(job)], self.pool, self._clip_dir(clip, job))
+                except Exception as e:
+                    job.record(clip, e, self.pool)
+
+    def _throttle(self, job):
+        return self.bandwidth.for_job(id(job)) if self.bandwidth else None
+
+    def _clip_dir(self, clip, job):
+        """Dossier du clip pour job, sur la destination choisie à son admission"""
+        return os.path.join(self._roots.get(clip['id'], ''), job.output_dir)
+
+    def _admit(self, clip, job, size):
+        """
+        Réserve l'espace disque du clip avant son téléchargement, en
+        attendant si aucune destination n'a de place. Lève DownloadCancelled
+        si le téléchargement est annulé pendant l'attente.
+        """
+        if not self.outputs:
+            return
+
+        def on_pause(paused):
+            if paused:
+                job.message("Espace disque insuffisant sur toutes les destinations, "
+                            "téléchargements en pause")
+                job.event({"event": "paused", "reason": "disk_full"})
+            else:
+                job.message("Espace disque disponible, reprise des téléchargements")
+                job.event({"event": "resumed"})
+
+        root = self.outputs.admit(clip['id'], job.output_dir, clip_filename(clip), estimate_size(clip, size),
+                                  self.pool.is_cancelled, on_pause)
+        if root:
+            with self._lock:
+                self._roots[clip['id']] = root
+
+    def _on_size(self, clip):
+        """Correction de la réservation du clip d'après la taille annoncée par le CDN"""
+        if not self.outputs:
+            return None
+        return lambda size: self.outputs.resize(clip['id'], size)
+
+    def _release(self, clip):
+        if self.outputs:
+            self.outputs.release(clip['id'])
+
+    def _store_add(self, store, clip, path, sha256=None):
+        """
+        Range un clip téléchargé dans le stockage partagé, sauf s'il a été
+        placé sur un autre volume que celui du stockage : le lien y est
+        impossible, et la copie remplirait le volume plein qu'il a évité.
+        """
+        if clip['id'] in self._roots:
+            if os.stat(os.path.dirname(path) or '.').st_dev != os.stat(store.root).st_dev:
+                return
+        store.add(clip['id'], path, sha256)
+
+    def _link(self, clip, source_job, target_job):
+        """
+        Lie un clip terminé, et ses fichiers de post-traitement, dans le
+        dossier d'un autre job, sur la même destination que l'original.
+        """
+        source = self.downloader.clip_path(clip, self._clip_dir(clip, source_job))
+        target = self.downloader.clip_path(clip, self._clip_dir(clip, target_job))
+        link_or_copy(source, target)
+        if self.postprocess:
+            for source_extra, target_extra in zip(sidecars(source), sidecars(target)):
+                if os.path.exists(source_extra):
+                    link_or_copy(source_extra, target_extra)
+
+    def _postprocess(self, clip, store):
+        """Confie un clip téléchargé au pool de post-traitement, il est enregistré à la fin"""
+        path = self.downloader.clip_path(clip, self._clip_dir(clip, self._owners[clip['id']][0]))
+        future = self._postprocessor.submit(path)
+        future.add_done_callback(lambda f: self._postprocessed(clip, path, f, store))
+
+    def _postprocess_result(self, clip, jobs, future):
+        """Résultat de process_clip, les erreurs des étapes étant signalées aux jobs"""
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'sha256': None, 'errors': [str(e)]}
+        for error in result['errors']:
+            for job in jobs:
+                job.message(f"Erreur de post-traitement sur le clip {clip['title']}: {error}")
+        return result
+
+    def _postprocessed(self, clip, path, future, store):
+        # Un post-traitement en erreur ne fait pas échouer le clip téléchargé
+        result = self._postprocess_result(clip, self._owners[clip['id']][:1], future)
+        outcome = True
+        if store:
+            try:
+                self._store_add(store, clip, path, result['sha256'])
+            except Exception as e:
+                outcome = e
+        self._record(clip, outcome)
+
+    def _finish(self, clip, outcome, store):
+        if outcome is True and self._postprocessor:
+            self._postprocess(clip, store)
+            return
+        if outcome is True and store:
+            try:
+                first = self._owners[clip['id']][0]
+                self._store_add(store, clip, self.downloader.clip_path(clip, self._clip_dir(clip, first)))
+            except Exception as e:
+                outcome = e
+        self._record(clip, outcome)
+
+    async def _download_async(self, stream, on_download, store):
+        downloader = self.downloader
+        loop = asyncio.get_running_loop()
+        # Le flux (recherche, journal) avance dans son propre thread pour ne
+        # pas bloquer la boucle ; un seul thread pour l'empreinte, les liens
+        # et les compteurs des jobs, qui ne sont donc pas modifiés en parallèle
+        feeder = ThreadPoolExecutor(max_workers=1)
+        finisher = ThreadPoolExecutor(max_workers=1)
+        batches = batched(stream, GQL_BATCH_SIZE)
+        slots = asyncio.Semaphore(self.async_concurrency)
+        running = set()
+
+        async with AsyncTwitchClipDownloader(downloader.client_id, downloader.client_secret,
+                                             max_connections=self.async_concurrency,
+                                             max_per_host=self.pool.max_per_host,
+                                             token_manager=downloader.tokens,
+                                             governor=downloader.governor,
+                                             metrics=downloader.metrics,
+                                             quality_policy=downloader.quality_policy,
+                                             dns_ttl=downloader.transport.dns_ttl) as async_downloader:
+            async def run(clip, download_url):
+                first = self._owners[clip['id']][0]
+                try:
+                    if self.pool.is_cancelled():
+                        outcome = DownloadCancelled()
+                    else:
+                        outcome = await async_downloader.download_clip(
+                            clip, self._clip_dir(clip, first), on_download,
+                            download_url, self.pool.is_cancelled,
+                            self._throttle(first), self._on_size(clip))
+                except Exception as e:
+                    outcome = e
+                self._release(clip)
+                if not self._postprocessor:
+                    slots.release()
+                    await loop.run_in_executor(finisher, self._finish, clip, outcome, store)
+                    return
+                try:
+                    # Créneau gardé jusqu'à la prise en charge par le pool de
+                    # processus : les téléchargements attendent quand il est saturé
+                    await loop.run_in_executor(finisher, self._finish, clip, outcome, store)
+                finally:
+                    slots.release()
+
+            while True:
+                batch = await loop.run_in_executor(feeder, next, batches, None)
+                if batch is None:
+                    break
+                if self.preflight:
+                    # Requêtes HEAD bloquantes, faites dans le thread du flux
+                    source_urls, sizes, rejected = await loop.run_in_executor(feeder, self._choose_urls, batch)
+                else:
+                    source_urls = await async_downloader.get_clip_source_urls([clip['id'] for clip in batch])
+                    sizes, rejected = {}, {}
+                for clip in batch:
+                    if clip['id'] in rejected:
+                        await loop.run_in_executor(finisher, self._finish, clip, rejected[clip['id']], store)
+                        continue
+                    try:
+                        # Le flux attend, dans son thread, qu'une destination ait la place du clip
+                        await loop.run_in_executor(feeder, self._admit, clip, self._owners[clip['id']][0],
+                                                   sizes.get(clip['id'], 0))
+                    except Exception as e:
+                        await loop.run_in_executor(finisher, self._finish, clip, e, store)
+                        continue
+                    # Pas plus de async_concurrency clips en cours : le flux attend
+                    await slots.acquire()
+                    task = asyncio.ensure_future(run(clip, source_urls.get(clip['id'])))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+
+            if running:
+                await asyncio.gather(*running)
+        feeder.shutdown()
+        finisher.shutdown()
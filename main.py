@@ -1,83 +1,129 @@
 import sys
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QLineEdit, QPushButton, 
-                            QProgressBar, QTextEdit, QDateEdit, QMessageBox)
+                            QProgressBar, QDateEdit, QMessageBox)
 from PyQt6.QtCore import QThread, pyqtSignal, QDate
 from PyQt6.QtGui import QFont
 
 from config_manager import ConfigManager
 from twitch_downloader import TwitchClipDownloader
+from download_pool import DownloadPool
+from clip_job import ClipJob, FanOutJob
+from job_scheduler import JobScheduler
+from metrics import Metrics, MetricsExporter
+from quality_policy import QualityPolicy
+from transport import Transport
+from bandwidth import BandwidthScheduler, BandwidthProfile, MEGABYTE
+from output_manager import OutputManager
 from info_dialog import InfoDialog
+from gui_progress import ProgressHub, ProgressPanel
 
 class DownloaderThread(QThread):
-    progress_updated = pyqtSignal(str)
-    download_progress = pyqtSignal(int, int, str)
+    # Logs et progression passent par le ProgressHub, relevé par l'interface à intervalle fixe
     finished = pyqtSignal(dict)
 
-    def __init__(self, client_id, client_secret, channel_name, creator_name, start_date, end_date):
+    def __init__(self, client_id, client_secret, jobs, hub,
+                 max_workers=4, max_per_host=4, index_path=None, use_async=False, async_concurrency=100,
+                 user_cache_path=None, token_cache_path=None, metrics_path=None, store_path=None,
+                 quality_policy=None, preflight=False, transport=None, postprocess=(),
+                 postprocess_workers=None, bandwidth=None, outputs=None):
         super().__init__()
         self.client_id = client_id
         self.client_secret = client_secret
-        self.channel_name = channel_name
-        self.creator_name = creator_name
-        self.start_date = start_date
-        self.end_date = end_date
+        self.jobs = jobs
+        self.hub = hub
         self.is_cancelled = False
+        self.pool = DownloadPool(max_workers, max_per_host)
+        self.index_path = index_path
+        self.use_async = use_async
+        self.async_concurrency = async_concurrency
+        self.user_cache_path = user_cache_path
+        self.token_cache_path = token_cache_path
+        self.metrics_path = metrics_path
+        self.store_path = store_path
+        self.quality_policy = quality_policy
+        self.preflight = preflight
+        self.transport = transport
+        self.postprocess = postprocess
+        self.postprocess_workers = postprocess_workers
+        self.bandwidth = bandwidth
+        self.outputs = outputs
+        self.metrics = Metrics()
+        self.job_progress = {}
         
     def cancel(self):
         self.is_cancelled = True
+        self.pool.cancel()
         
     def run(self):
+        exporter = MetricsExporter(self.metrics, self.metrics_path) if self.metrics_path else None
+        if exporter:
+            exporter.start()
         try:
-            downloader = TwitchClipDownloader(self.client_id, self.client_secret)
+            downloader = TwitchClipDownloader(self.client_id, self.client_secret,
+                                              user_cache_path=self.user_cache_path,
+                                              token_cache_path=self.token_cache_path,
+                                              metrics=self.metrics,
+                                              quality_policy=self.quality_policy,
+                                              transport=self.transport)
+            scheduler = JobScheduler(downloader, self.pool,
+                                     index_path=self.index_path,
+                                     use_async=self.use_async,
+                                     async_concurrency=self.async_concurrency,
+                                     store_path=self.store_path,
+                                     preflight=self.preflight,
+                                     postprocess=self.postprocess,
+                                     postprocess_workers=self.postprocess_workers,
+                                     bandwidth=self.bandwidth,
+                                     outputs=self.outputs)
+            for job in self.jobs:
+                scheduler.add(job)
             
-            self.progress_updated.emit("Recherche des IDs utilisateurs...")
-            channel_id = downloader.get_user_id(self.channel_name)
-            creator_id = downloader.get_user_id(self.creator_name)
-            
-            if not channel_id or not creator_id:
-                self.finished.emit({"success": False, "message": "Impossible de trouver l'ID de la chaîne ou du créateur"})
-                return
-            
-            self.progress_updated.emit("Recherche des clips disponibles...")
-            clips = downloader.get_clips(channel_id, creator_id, self.start_date, self.end_date)
-            
-            if not clips:
-                self.finished.emit({"success": False, "message": "Aucun clip trouvé pour la période spécifiée"})
-                return
-            
-            self.progress_updated.emit(f"Nombre total de clips trouvés: {len(clips)}")
-                
-            output_dir = f"bulkdownload_{self.channel_name}_{self.creator_name}_{self.start_date.strftime('%d-%m-%Y')}_{self.end_date.strftime('%d-%m-%Y')}"
-            
-            successful_downloads = 0
-            failed_downloads = 0
-            
-            for i, clip in enumerate(clips, 1):
-                if self.is_cancelled:
-                    self.progress_updated.emit("Téléchargement annulé après la fin du clip en cours...")
-                    break
-                
-                self.progress_updated.emit(f"Traitement du clip {i}/{len(clips)}: {clip['title']}")
-                if downloader.download_clip(clip, output_dir, 
-                                         lambda c, t, f: self.download_progress.emit(c, t, f)):
-                    successful_downloads += 1
-                else:
-                    failed_downloads += 1
-                self.progress_updated.emit(f"Progression totale: {int((i/len(clips))*100)}%")
-            
-            result = {
-                "success": True,
-                "total": len(clips),
-                "successful": successful_downloads,
-                "failed": failed_downloads,
-                "output_dir": output_dir,
-                "cancelled": self.is_cancelled
-            }
-            self.finished.emit(result)
+            results = scheduler.run(on_message=self.on_job_message,
+                                    on_download=self.hub.download,
+                                    on_event=self.on_job_event)
+            self.finished.emit(self.merge_results(results))
             
         except Exception as e:
             self.finished.emit({"success": False, "message": str(e)})
+        finally:
+            if exporter:
+                exporter.stop()
+    
+    def on_job_message(self, job, message):
+        # La progression globale est calculée sur l'ensemble des jobs
+        if message.startswith("Progression totale:"):
+            return
+        if len(self.jobs) > 1:
+            message = f"[{job.channel_name}/{job.creator_name}] {message}"
+        self.hub.log(message)
+    
+    def on_job_event(self, job, data):
+        if data["event"] == "job_clips":
+            self.job_progress[id(job)] = [data["total"] - data["remaining"], data["total"]]
+        elif data["event"] == "clip":
+            self.job_progress[id(job)] = [data["processed"], data["total"]]
+            processed = sum(done for done, total in self.job_progress.values())
+            total = sum(total for done, total in self.job_progress.values())
+            self.hub.overall(processed, total)
+            self.hub.metrics(self.metrics.snapshot())
+    
+    def merge_results(self, results):
+        """Regroupe les résultats des jobs en un seul résultat pour l'interface"""
+        succeeded = [result for result in results if result["success"]]
+        if not succeeded:
+            return {"success": False, "message": " / ".join(result["message"] for result in results)}
+        for result in results:
+            if not result["success"]:
+                self.hub.log(f"Erreur: {result['message']}")
+        return {
+            "success": True,
+            "total": sum(result["total"] for result in succeeded),
+            "successful": sum(result["successful"] for result in succeeded),
+            "failed": sum(result["failed"] for result in succeeded),
+            "output_dir": ", ".join(result["output_dir"] for result in succeeded),
+            "cancelled": self.is_cancelled
+        }
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -88,7 +134,7 @@ class MainWindow(QMainWindow):
 
     def init_ui(self):
         self.setWindowTitle("Bulk Twitch Clips Downloader")
-        self.setFixedSize(800, 700)
+        self.setFixedSize(800, 820)
         
         # Style général
         self.setStyleSheet("""
@@ -123,13 +169,19 @@ class MainWindow(QMainWindow):
             QPushButton:disabled {
                 background-color: #3c3c44;
             }
-            QTextEdit {
+            QListView, QTableView {
                 background-color: #1f1f23;
                 color: #efeff1;
                 border: 2px solid #3c3c44;
                 border-radius: 4px;
                 font-family: monospace;
             }
+            QHeaderView::section {
+                background-color: #18181b;
+                color: #efeff1;
+                border: none;
+                padding: 4px;
+            }
             QProgressBar {
                 border: 2px solid #3c3c44;
                 border-radius: 4px;
@@ -175,7 +227,7 @@ class MainWindow(QMainWindow):
         channel_label = QLabel("Chaîne Twitch:")
         channel_label.setFixedWidth(150)
         self.channel_input = QLineEdit()
-        self.channel_input.setPlaceholderText("Nom de la chaîne")
+        self.channel_input.setPlaceholderText("Nom de la chaîne (plusieurs séparées par des virgules)")
         channel_layout.addWidget(channel_label)
         channel_layout.addWidget(self.channel_input)
         form_layout.addLayout(channel_layout)
@@ -219,9 +271,16 @@ class MainWindow(QMainWindow):
         layout.addLayout(form_layout)
         
         # Bouton de téléchargement
+        buttons_layout = QHBoxLayout()
         self.download_button = QPushButton("Démarrer le téléchargement")
         self.download_button.clicked.connect(self.start_download)
-        layout.addWidget(self.download_button)
+        buttons_layout.addWidget(self.download_button)
+        
+        # Bouton d'ajout à la file d'attente
+        self.queue_button = QPushButton("Ajouter à la file")
+        self.queue_button.clicked.connect(self.add_to_queue)
+        buttons_layout.addWidget(self.queue_button)
+        layout.addLayout(buttons_layout)
 
         # Bouton d'annulation'
         self.cancel_button = QPushButton("Annuler")
@@ -236,19 +295,20 @@ class MainWindow(QMainWindow):
         self.total_progress.setFormat("Progression totale: %p%")
         progress_layout.addWidget(self.total_progress)
         
-        self.current_progress = QProgressBar()
-        self.current_progress.setFormat("Clip en cours: %p%")
-        progress_layout.addWidget(self.current_progress)
-        
         layout.addLayout(progress_layout)
         
-        # Zone de logs
-        self.log_output = QTextEdit()
-        self.log_output.setReadOnly(True)
-        self.log_output.setFixedHeight(200)
-        layout.addWidget(self.log_output)
+        # Téléchargements en cours et logs, rafraîchis par un timer
+        self.progress_hub = ProgressHub()
+        self.progress_panel = ProgressPanel(self.progress_hub,
+                                            on_overall=self.update_overall_progress,
+                                            on_metrics=self.update_metrics)
+        self.progress_panel.worker_view.setFixedHeight(150)
+        layout.addWidget(self.progress_panel.worker_view)
+        self.progress_panel.log_view.setFixedHeight(200)
+        layout.addWidget(self.progress_panel.log_view)
         
         self.downloader_thread = None
+        self.job_queue = []
 
     def show_info(self):
         info_dialog = InfoDialog(self)
@@ -267,17 +327,53 @@ class MainWindow(QMainWindow):
             self.download_button.setEnabled(False)
 
     def log(self, message):
-        self.log_output.append(message)
-        self.log_output.verticalScrollBar().setValue(
-            self.log_output.verticalScrollBar().maximum()
+        for line in message.split('\n'):
+            self.progress_hub.log(line)
+        
+    def current_job(self):
+        # Plusieurs chaînes séparées par des virgules : une seule recherche sur toutes
+        channels = [name.strip() for name in self.channel_input.text().split(',') if name.strip()]
+        if len(channels) > 1:
+            return FanOutJob(
+                channels,
+                self.creator_input.text(),
+                self.start_date_input.date().toPyDate(),
+                self.end_date_input.date().toPyDate()
+            )
+        return ClipJob(
+            self.channel_input.text(),
+            self.creator_input.text(),
+            self.start_date_input.date().toPyDate(),
+            self.end_date_input.date().toPyDate()
         )
+    
+    def add_to_queue(self):
+        if not self.channel_input.text() or not self.creator_input.text():
+            QMessageBox.warning(self, "Erreur", "Veuillez remplir tous les champs")
+            return
+        
+        job = self.current_job()
+        if any(existing.describe() == job.describe() for existing in self.job_queue):
+            self.log("Ce job est déjà dans la file")
+            return
+        self.job_queue.append(job)
+        self.log(f"Ajouté à la file ({len(self.job_queue)}): {job.channel_name} / {job.creator_name} "
+                 f"du {job.start_date.strftime('%d/%m/%Y')} au {job.end_date.strftime('%d/%m/%Y')}")
+        self.creator_input.clear()
         
     def start_download(self):
-        if not self.channel_input.text() or not self.creator_input.text():
+        jobs = list(self.job_queue)
+        if self.channel_input.text() and self.creator_input.text():
+            jobs.append(self.current_job())
+        
+        if not jobs:
             QMessageBox.warning(self, "Erreur", "Veuillez remplir tous les champs")
             return
+        
+        self.job_queue = []
             
         self.download_button.setEnabled(False)
+        self.queue_button.setEnabled(False)
         self.cancel_button.setEnabled(True)
         self.channel_input.setEnabled(False)
         self.creator_input.setEnabled(False)
@@ -285,42 +381,58 @@ class MainWindow(QMainWindow):
         self.end_date_input.setEnabled(False)
         
         self.total_progress.setValue(0)
-        self.current_progress.setValue(0)
+        self.total_progress.setFormat("Progression totale: %p%")
+        self.progress_panel.worker_model.clear()
         
         self.downloader_thread = DownloaderThread(
             self.config_manager.get_client_id(),
             self.config_manager.get_client_secret(),
-            self.channel_input.text(),
-            self.creator_input.text(),
-            self.start_date_input.date().toPyDate(),
-            self.end_date_input.date().toPyDate()
+            jobs,
+            self.progress_hub,
+            self.config_manager.get_max_workers(),
+            self.config_manager.get_max_connections_per_host(),
+            self.config_manager.get_index_path(),
+            self.config_manager.get_async_downloads(),
+            self.config_manager.get_async_concurrency(),
+            self.config_manager.get_user_cache_path(),
+            self.config_manager.get_token_cache_path(),
+            self.config_manager.get_metrics_path() or None,
+            self.config_manager.get_store_path() or None,
+            QualityPolicy(self.config_manager.get_max_height(),
+                          self.config_manager.get_max_fps(),
+                          self.config_manager.get_max_bitrate()),
+            self.config_manager.get_preflight(),
+            Transport(self.config_manager.get_http_pool_size(),
+                      self.config_manager.get_http2(),
+                      self.config_manager.get_dns_cache_ttl()),
+            self.config_manager.get_postprocess(),
+            self.config_manager.get_postprocess_workers() or None,
+            BandwidthScheduler(self.config_manager.get_max_bandwidth() * MEGABYTE,
+                               self.config_manager.get_job_bandwidth() * MEGABYTE,
+                               BandwidthProfile(self.config_manager.get_bandwidth_schedule())),
+            OutputManager(self.config_manager.get_overflow_dirs(),
+                          self.config_manager.get_min_free_space() * MEGABYTE)
         )
         
-        self.downloader_thread.progress_updated.connect(self.update_progress)
-        self.downloader_thread.download_progress.connect(self.update_download_progress)
         self.downloader_thread.finished.connect(self.download_finished)
         
         self.downloader_thread.start()
         
-    def update_progress(self, message):
-        self.log(message)
-        if message.startswith("Progression totale:"):
-            percentage = int(message.split(":")[1].strip().replace("%", ""))
-            self.total_progress.setValue(percentage)
-        
-    def update_download_progress(self, current, total, filename):
-        percentage = int((current / total) * 100) if total > 0 else 0
-        self.current_progress.setValue(percentage)
-        self.current_progress.setFormat(f"Téléchargement de {filename}: {percentage}%")
+    def update_overall_progress(self, processed, total):
+        self.total_progress.setValue(int((processed / total) * 100) if total > 0 else 0)
+
+    def update_metrics(self, snapshot):
+        self.total_progress.setFormat(f"Progression totale: %p% ({snapshot.throughput_mbps:.1f} Mo/s)")
 
     def cancel_download(self):
         if self.downloader_thread and self.downloader_thread.isRunning():
-            self.log("Annulation demandée... Attente de la fin du clip en cours...")
+            self.log("Annulation demandée... Interruption des téléchargements en cours...")
             self.cancel_button.setEnabled(False)
             self.downloader_thread.cancel()
 
     def download_finished(self, result):
         self.download_button.setEnabled(True)
+        self.queue_button.setEnabled(True)
         self.cancel_button.setEnabled(False)
         self.channel_input.setEnabled(True)
         self.creator_input.setEnabled(True)
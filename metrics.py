@@ -0,0 +1,221 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+
+# Bornes (en secondes) des histogrammes de latence
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes, au format Prometheus"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else 0.0
+        }
+
+
+@dataclass
+class ClipStats:
+    """Statistiques d'un clip terminé"""
+    clip_id: str
+    bytes: int
+    ttfb: float
+    duration: float
+    success: bool
+    # Interrompu par l'annulation : ni réussi ni échoué
+    cancelled: bool = False
+    type: str = "clip"
+
+
+@dataclass
+class MetricsSnapshot:
+    """État agrégé des métriques à un instant donné"""
+    elapsed: float
+    bytes: int
+    throughput_mbps: float
+    clips_ok: int
+    clips_failed: int
+    clips_cancelled: int
+    in_flight: int
+    queue_depth: int
+    retries: dict = field(default_factory=dict)
+    latencies: dict = field(default_factory=dict)
+    type: str = "snapshot"
+
+
+class Metrics:
+    """
+    Métriques de téléchargement partagées par le téléchargeur, le pool et
+    le limiteur : octets, temps jusqu'au premier octet, latences Helix/GQL,
+    nouvelles tentatives, débit global et profondeur de file.
+
+    Les fonctions enregistrées avec add_listener reçoivent un ClipStats à
+    la fin de chaque clip.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.started_at = time.monotonic()
+        self.bytes = 0
+        self.clips_ok = 0
+        self.clips_failed = 0
+        self.clips_cancelled = 0
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.retries = {}
+        self.latencies = {}
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def observe_latency(self, name, seconds):
+        with self._lock:
+            if name not in self.latencies:
+                self.latencies[name] = Histogram()
+            self.latencies[name].observe(seconds)
+
+    def record_retry(self, name, count=1):
+        with self._lock:
+            self.retries[name] = self.retries.get(name, 0) + count
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes += count
+
+    def set_queue_depth(self, depth):
+        self.queue_depth = depth
+
+    def clip_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def clip_finished(self, stats):
+        with self._lock:
+            self.in_flight -= 1
+            if stats.success:
+                self.clips_ok += 1
+            elif stats.cancelled:
+                self.clips_cancelled += 1
+            else:
+                self.clips_failed += 1
+        if stats.ttfb is not None:
+            self.observe_latency('ttfb', stats.ttfb)
+        for callback in self._listeners:
+            callback(stats)
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.started_at
+            return MetricsSnapshot(
+                elapsed=round(elapsed, 3),
+                bytes=self.bytes,
+                throughput_mbps=round(self.bytes / elapsed / 1e6, 3) if elapsed > 0 else 0.0,
+                clips_ok=self.clips_ok,
+                clips_failed=self.clips_failed,
+                clips_cancelled=self.clips_cancelled,
+                in_flight=self.in_flight,
+                queue_depth=self.queue_depth,
+                retries=dict(self.retries),
+                latencies={name: histogram.summary() for name, histogram in self.latencies.items()}
+            )
+
+    def to_prometheus(self):
+        """Exporte les métriques au format texte Prometheus"""
+        snapshot = self.snapshot()
+        lines = [
+            "# TYPE twitch_clips_bytes_total counter",
+            f"twitch_clips_bytes_total {snapshot.bytes}",
+            "# TYPE twitch_clips_total counter",
+            f'twitch_clips_total{{status="ok"}} {snapshot.clips_ok}',
+            f'twitch_clips_total{{status="failed"}} {snapshot.clips_failed}',
+            f'twitch_clips_total{{status="cancelled"}} {snapshot.clips_cancelled}',
+            "# TYPE twitch_clips_throughput_mbps gauge",
+            f"twitch_clips_throughput_mbps {snapshot.throughput_mbps}",
+            "# TYPE twitch_clips_in_flight gauge",
+            f"twitch_clips_in_flight {snapshot.in_flight}",
+            "# TYPE twitch_clips_queue_depth gauge",
+            f"twitch_clips_queue_depth {snapshot.queue_depth}",
+            "# TYPE twitch_clips_retries_total counter",
+        ]
+        for name, count in sorted(snapshot.retries.items()):
+            lines.append(f'twitch_clips_retries_total{{kind="{name}"}} {count}')
+
+        lines.append("# TYPE twitch_clips_latency_seconds histogram")
+        with self._lock:
+            histograms = sorted(self.latencies.items())
+            for name, histogram in histograms:
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'twitch_clips_latency_seconds_bucket{{kind="{name}",le="{bound}"}} {count}')
+                lines.append(f'twitch_clips_latency_seconds_bucket{{kind="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'twitch_clips_latency_seconds_sum{{kind="{name}"}} {histogram.total}')
+                lines.append(f'twitch_clips_latency_seconds_count{{kind="{name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """
+    Exporte périodiquement les métriques dans un fichier : texte Prometheus
+    (réécrit en entier) si le chemin se termine par .prom, sinon JSON Lines
+    (un instantané par intervalle et une ligne par clip terminé).
+    """
+
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.prometheus = path.endswith('.prom')
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        if not self.prometheus:
+            metrics.add_listener(self._write_event)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.export()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def export(self):
+        try:
+            if self.prometheus:
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(self.metrics.to_prometheus())
+                os.replace(tmp_path, self.path)
+            else:
+                self._write_event(self.metrics.snapshot())
+        except Exception as e:
+            print(f"Erreur lors de l'export des métriques: {e}")
+
+    def _write_event(self, event):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(dict(asdict(event), time=round(time.time(), 3))) + '\n')
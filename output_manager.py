@@ -0,0 +1,165 @@
+import os
+import shutil
+import threading
+
+from bandwidth import MEGABYTE
+from download_pool import DownloadCancelled
+
+# Intervalle de nouvelle vérification de l'espace libre pendant une pause (en secondes)
+PAUSE_CHECK_INTERVAL = 1.0
+
+# Débit supposé d'un clip dont la taille n'est pas annoncée (octets par seconde de vidéo)
+UNKNOWN_BITRATE = MEGABYTE
+
+# Taille supposée d'un clip dont ni la taille ni la durée ne sont connues
+UNKNOWN_CLIP_SIZE = 60 * MEGABYTE
+
+
+def estimate_size(clip, size=0):
+    """Taille à réserver pour un clip : celle annoncée par le CDN si connue, sinon d'après sa durée"""
+    if size:
+        return size
+    duration = float(clip.get('duration') or 0)
+    return int(duration * UNKNOWN_BITRATE) if duration else UNKNOWN_CLIP_SIZE
+
+
+def allocated(path):
+    """
+    Octets déjà occupés sur le disque par un fichier, 0 s'il n'existe pas.
+    StreamWriter réserve toute la taille du clip à l'ouverture : l'espace
+    libre du volume en tient déjà compte, même avant l'écriture des données.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0
+    blocks = getattr(stat, 'st_blocks', None)
+    # Sans st_blocks (Windows), la taille du fichier est la meilleure approximation
+    return blocks * 512 if blocks is not None else stat.st_size
+
+
+class DiskFull(OSError):
+    """Clip plus gros que l'espace total de toutes les destinations"""
+
+
+class OutputManager:
+    """
+    Choix de la destination de chaque téléchargement selon l'espace libre.
+
+    Les destinations sont le dossier courant puis les dossiers de
+    débordement (overflow_dirs), essayés dans cet ordre ; le dossier d'un
+    job est recréé sous celle qui reçoit le clip. Avant chaque
+    téléchargement, admit réserve la taille prévue du clip sur la
+    première destination qui garde min_free octets libres une fois tous
+    les téléchargements en cours terminés, et resize la remplace par la
+    taille annoncée par la réponse (content-length) avant l'écriture. Les
+    réservations d'un même volume sont additionnées, moins l'espace déjà
+    alloué aux fichiers, qui est déjà décompté de l'espace libre.
+
+    Quand aucune destination n'a de place, admit attend qu'un
+    téléchargement se termine ou que de l'espace soit libéré : la file est
+    en pause au lieu de faire échouer tous les clips restants.
+    """
+
+    def __init__(self, overflow_dirs=None, min_free=0):
+        self.targets = [''] + [directory for directory in overflow_dirs or [] if directory]
+        self.min_free = min_free
+        self._cond = threading.Condition()
+        # clé -> (volume, chemin du fichier, taille réservée)
+        self._reservations = {}
+        self._paused = False
+
+    @property
+    def enabled(self):
+        return bool(self.min_free or len(self.targets) > 1)
+
+    def _device(self, root):
+        # Pas de création : un point de montage absent ne doit pas être rempli sur le disque système
+        return os.stat(root or '.').st_dev
+
+    def _outstanding(self, device):
+        """Octets réservés sur un volume et pas encore alloués aux fichiers"""
+        total = 0
+        for reserved_device, path, size in self._reservations.values():
+            if reserved_device != device:
+                continue
+            # .part en cours, ou fichier final si le .part vient d'être renommé
+            total += max(0, size - max(allocated(path + '.part'), allocated(path)))
+        return total
+
+    def _available(self, root):
+        """Octets encore utilisables sur la destination root, ou None si elle est inaccessible"""
+        try:
+            device = self._device(root)
+            free = shutil.disk_usage(root or '.').free
+        except OSError as e:
+            print(f"Erreur: destination {root} inaccessible: {e}")
+            return None
+        return free - self._outstanding(device) - self.min_free
+
+    def _existing(self, output_dir, filename):
+        """Destination contenant déjà le clip ou son .part, pour reprendre au même endroit"""
+        for root in self.targets:
+            path = os.path.join(root, output_dir, filename)
+            if os.path.exists(path + '.part') or os.path.exists(path):
+                return root
+        return None
+
+    def _check_capacity(self, size):
+        for root in self.targets:
+            try:
+                if shutil.disk_usage(root or '.').total - self.min_free >= size:
+                    return
+            except OSError:
+                continue
+        raise DiskFull(f"clip de {size} octets plus gros que toutes les destinations")
+
+    def admit(self, key, output_dir, filename, size, is_cancelled=None, on_pause=None):
+        """
+        Réserve size octets pour le fichier filename du dossier de job
+        output_dir et retourne la destination choisie. Bloque tant
+        qu'aucune n'a de place ; on_pause(True/False) est appelé au début et
+        à la fin de la pause. Lève DownloadCancelled si is_cancelled()
+        devient vrai pendant l'attente.
+        """
+        self._check_capacity(size)
+        existing = self._existing(output_dir, filename)
+        roots = self.targets if existing is None else [existing] + [r for r in self.targets if r != existing]
+        with self._cond:
+            while True:
+                if is_cancelled and is_cancelled():
+                    raise DownloadCancelled()
+                for root in roots:
+                    path = os.path.join(root, output_dir, filename)
+                    available = self._available(root)
+                    if available is not None and available >= size - allocated(path + '.part'):
+                        self._reservations[key] = (self._device(root), path, size)
+                        if self._paused:
+                            self._paused = False
+                            if on_pause:
+                                on_pause(False)
+                        return root
+                if not self._paused:
+                    self._paused = True
+                    if on_pause:
+                        on_pause(True)
+                self._cond.wait(PAUSE_CHECK_INTERVAL)
+
+    def resize(self, key, size):
+        """
+        Remplace la taille réservée par la taille réelle du fichier, connue
+        à la réponse du CDN. Le clip reste sur sa destination : un écart
+        avec la taille prévue est absorbé par la marge min_free.
+        """
+        with self._cond:
+            reservation = self._reservations.get(key)
+            if reservation:
+                self._reservations[key] = reservation[:2] + (size,)
+                if size < reservation[2]:
+                    self._cond.notify_all()
+
+    def release(self, key):
+        """Libère la réservation d'un téléchargement terminé, réussi ou non"""
+        with self._cond:
+            if self._reservations.pop(key, None):
+                self._cond.notify_all()
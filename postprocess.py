@@ -0,0 +1,133 @@
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Étapes disponibles, exécutées dans cet ordre
+TASKS = ('faststart', 'thumbnail', 'checksum')
+
+# Position de la miniature dans le clip (en secondes)
+THUMBNAIL_AT = 1.0
+
+
+def sidecars(path):
+    """Fichiers produits à côté d'un clip : miniature et empreinte"""
+    return [os.path.splitext(path)[0] + '.jpg', path + '.sha256']
+
+
+def is_faststart(path):
+    """
+    Indique si l'atome moov d'un MP4 précède les données (mdat), ce qui
+    permet la lecture avant la fin du téléchargement. None si le fichier
+    n'est pas un MP4 lisible.
+    """
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            size, kind = struct.unpack('>I4s', header)
+            if kind == b'moov':
+                return True
+            if kind == b'mdat':
+                return False
+            if size == 1:
+                size = struct.unpack('>Q', f.read(8))[0] - 8
+            elif size < 8:
+                return None
+            f.seek(size - 8, os.SEEK_CUR)
+
+
+def _ffmpeg(ffmpeg, *args):
+    result = subprocess.run([ffmpeg, '-v', 'error', '-y', *args], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffmpeg a échoué ({result.returncode})")
+
+
+def faststart(path, ffmpeg):
+    """Remuxe le clip sans réencodage pour placer moov en tête. Retourne True s'il a été réécrit"""
+    if is_faststart(path) is not False:
+        return False
+    tmp_path = path + '.remux'
+    try:
+        _ffmpeg(ffmpeg, '-i', path, '-map', '0', '-c', 'copy', '-movflags', '+faststart', '-f', 'mp4', tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+
+def thumbnail(path, ffmpeg):
+    _ffmpeg(ffmpeg, '-ss', str(THUMBNAIL_AT), '-i', path, '-frames:v', '1', '-q:v', '3', sidecars(path)[0])
+
+
+def process_clip(path, tasks, ffmpeg):
+    """
+    Post-traite un clip dans un processus du pool. Retourne un dictionnaire
+    avec l'empreinte SHA-256 du fichier final et les erreurs des étapes :
+    une étape en erreur n'empêche pas les suivantes.
+    """
+    errors = []
+    for task, step in (('faststart', faststart), ('thumbnail', thumbnail)):
+        if task not in tasks:
+            continue
+        try:
+            step(path, ffmpeg)
+        except Exception as e:
+            errors.append(f"{task}: {e}")
+
+    # Empreinte toujours calculée ici : le stockage partagé la réutilise
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    sha256 = digest.hexdigest()
+    if 'checksum' in tasks:
+        with open(sidecars(path)[1], 'w', encoding='utf-8') as f:
+            f.write(f"{sha256}  {os.path.basename(path)}\n")
+
+    return {'sha256': sha256, 'errors': errors}
+
+
+class PostProcessor:
+    """
+    Post-traitement des clips téléchargés dans un pool de processus :
+    remux faststart, miniature et fichier d'empreinte.
+
+    Ces étapes, coûteuses en CPU, ne bloquent pas les workers réseau. Le
+    nombre de clips en attente est borné : quand le pool est saturé,
+    submit bloque, ce qui ralentit les téléchargements au lieu de
+    remplir le disque de clips non traités.
+    """
+
+    def __init__(self, tasks, max_workers=None, max_pending=None):
+        unknown = set(tasks) - set(TASKS)
+        if unknown:
+            raise ValueError(f"Étapes de post-traitement inconnues: {', '.join(sorted(unknown))}")
+        self.tasks = tuple(task for task in TASKS if task in tasks)
+        self.ffmpeg = shutil.which('ffmpeg')
+        if not self.ffmpeg and set(self.tasks) - {'checksum'}:
+            print("Erreur: ffmpeg introuvable, remux faststart et miniatures désactivés")
+            self.tasks = tuple(task for task in self.tasks if task == 'checksum')
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._slots = threading.BoundedSemaphore(max_pending or self.max_workers * 2)
+
+    def submit(self, path):
+        """Confie un clip au pool. Retourne un Future du résultat de process_clip"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(process_clip, path, self.tasks, self.ffmpeg)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def shutdown(self):
+        """Attend la fin des clips en cours de post-traitement"""
+        self._executor.shutdown(wait=True)
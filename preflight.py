@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from job_journal import JobJournal
+from twitch_downloader import DOWNLOAD_HEADERS, GQL_BATCH_SIZE, MIN_CLIP_SIZE
+
+
+@dataclass
+class ClipEstimate:
+    clip_id: str
+    url: str = None
+    # Taille annoncée par le CDN, 0 si inconnue
+    size: int = 0
+    duration: float = 0.0
+
+    @property
+    def too_small(self):
+        """Fichier trop petit pour être un clip valide : inutile de le télécharger"""
+        return 0 < self.size < MIN_CLIP_SIZE
+
+
+class Preflight:
+    """
+    Vérification des clips avant leur téléchargement.
+
+    Une requête HEAD par clip donne la taille de la qualité choisie par la
+    politique de qualité du téléchargeur, sans rien télécharger. Avec une
+    limite de débit, les qualités sont essayées de la préférée à la moins
+    bonne jusqu'à en trouver une qui la respecte. Les tailles servent aussi
+    à estimer le volume et la durée d'un job avant de le lancer.
+    """
+
+    def __init__(self, downloader, max_workers=8):
+        self.downloader = downloader
+        self.policy = downloader.quality_policy
+        self.max_workers = max_workers
+
+    def head_size(self, url):
+        """Taille du fichier à l'URL donnée, 0 si elle n'est pas connue"""
+        try:
+            response = self.downloader.transport.head(url, headers=DOWNLOAD_HEADERS, allow_redirects=True,
+                                                      timeout=30)
+            if response.status_code == 200:
+                return int(response.headers.get('content-length', 0))
+        except Exception as e:
+            print(f"Erreur lors de la requête HEAD: {e}")
+        return 0
+
+    def _estimate(self, clip, urls):
+        duration = float(clip.get('duration') or 0)
+        estimate = ClipEstimate(clip['id'], duration=duration)
+        for url in urls:
+            estimate.url = url
+            estimate.size = self.head_size(url)
+            if self.policy.fits_bitrate(estimate.size, duration):
+                break
+        return estimate
+
+    def check(self, clips, renditions):
+        """
+        Choisit l'URL de chaque clip parmi renditions ({id: [URLs]}, voir
+        get_clip_renditions) et mesure sa taille. Retourne {id: ClipEstimate}.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            estimates = executor.map(lambda clip: self._estimate(clip, renditions.get(clip['id'], [])), clips)
+            return {estimate.clip_id: estimate for estimate in estimates}
+
+    def resolve(self, clips):
+        """Résout les qualités des clips puis les vérifie. Retourne {id: ClipEstimate}"""
+        renditions = self.downloader.get_clip_renditions([clip['id'] for clip in clips])
+        return self.check(clips, renditions)
+
+    def estimate_job(self, job, max_workers=4, index=None):
+        """
+        Estime un job sans le démarrer : les clips sont ceux du journal si
+        la recherche y est terminée, sinon ceux d'une recherche (gardée dans
+        l'index). Les clips déjà téléchargés ne sont pas comptés. Retourne
+        la liste des estimations.
+        """
+        journal = JobJournal(job.output_dir)
+        if journal.clips is not None:
+            clips = [clip for clip in journal.clips if not journal.is_done(clip['id'])]
+        else:
+            ids = job.resolve(self.downloader)
+            if not ids:
+                raise ValueError("Impossible de trouver l'ID de la chaîne ou du créateur")
+            clips = list(job.find_clips(self.downloader, ids, max_workers, index))
+
+        estimates = []
+        for i in range(0, len(clips), GQL_BATCH_SIZE):
+            estimates.extend(self.resolve(clips[i:i + GQL_BATCH_SIZE]).values())
+        return estimates
+
+
+def summarize(estimates, throughput=None):
+    """
+    Résume des estimations : nombre de clips, octets et secondes de vidéo
+    attendus. throughput (octets/s, par exemple le débit moyen des
+    métriques) donne en plus une durée de téléchargement estimée.
+    """
+    valid = [estimate for estimate in estimates if estimate.url and not estimate.too_small]
+    size = sum(estimate.size for estimate in valid)
+    summary = {
+        "clips": len(valid),
+        "bytes": size,
+        "video_seconds": round(sum(estimate.duration for estimate in valid), 1),
+        "unknown_size": sum(1 for estimate in valid if not estimate.size),
+        "unavailable": sum(1 for estimate in estimates if not estimate.url),
+        "too_small": sum(1 for estimate in estimates if estimate.too_small),
+    }
+    if throughput:
+        summary["download_seconds"] = round(size / throughput, 1)
+    return summary
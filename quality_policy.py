@@ -0,0 +1,56 @@
+import re
+
+
+def quality_height(quality):
+    """Hauteur en pixels d'une qualité Twitch ("1080", "720p60"...), 0 si inconnue"""
+    match = re.match(r'(\d+)', str(quality.get('quality', '')))
+    return int(match.group(1)) if match else 0
+
+
+def quality_fps(quality):
+    try:
+        return float(quality.get('frameRate') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class QualityPolicy:
+    """
+    Choix de la qualité d'un clip parmi ses videoQualities.
+
+    max_height (par exemple 720), max_fps (par exemple 30) et max_bitrate
+    (en kbit/s) limitent les qualités acceptées, de la meilleure à la
+    moins bonne. Si aucune ne convient, la plus basse est retenue. Sans
+    limite, l'ordre de Twitch est conservé (qualité source en premier).
+
+    Le débit n'est pas fourni par Twitch : il est calculé à partir de la
+    taille (requête HEAD) et de la durée du clip lors de la vérification
+    préalable (voir preflight.py).
+    """
+
+    def __init__(self, max_height=None, max_fps=None, max_bitrate=None):
+        self.max_height = max_height or None
+        self.max_fps = max_fps or None
+        self.max_bitrate = max_bitrate or None
+
+    @property
+    def is_default(self):
+        return not (self.max_height or self.max_fps or self.max_bitrate)
+
+    def rank(self, qualities):
+        """Retourne les qualités acceptées, de la préférée à la moins bonne"""
+        qualities = [quality for quality in qualities if quality.get('sourceURL')]
+        if self.is_default or not qualities:
+            return qualities
+
+        ordered = sorted(qualities, key=lambda q: (quality_height(q), quality_fps(q)), reverse=True)
+        allowed = [quality for quality in ordered
+                   if (not self.max_height or quality_height(quality) <= self.max_height)
+                   and (not self.max_fps or quality_fps(quality) <= self.max_fps)]
+        return allowed or ordered[-1:]
+
+    def fits_bitrate(self, size, duration):
+        """Indique si un fichier de size octets pour duration secondes respecte max_bitrate"""
+        if not self.max_bitrate or not size or not duration:
+            return True
+        return size * 8 / duration / 1000 <= self.max_bitrate
@@ -0,0 +1,149 @@
+import asyncio
+import random
+import threading
+import time
+
+import requests
+
+
+class RateLimitGovernor:
+    """
+    Limiteur partagé pour les appels Helix.
+
+    Un seau à jetons rythme les requêtes selon le quota de l'application
+    (800 points par minute par défaut) et se recale sur les en-têtes
+    Ratelimit-Remaining / Ratelimit-Reset renvoyés par Twitch. Les réponses
+    429 et 5xx sont retentées avec un délai exponentiel aléatoire.
+    """
+
+    def __init__(self, limit=800, period=60.0, max_retries=5, backoff=1.0, max_backoff=60.0):
+        self.capacity = float(limit)
+        self.period = period
+        self.rate = limit / period
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        # Métriques (latences et nouvelles tentatives 'helix'), optionnelles
+        self.metrics = None
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """Réserve un jeton et retourne le temps d'attente avant de l'utiliser"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = max(0.0, self._paused_until - now)
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def update(self, headers):
+        """Recale le seau sur les en-têtes Ratelimit d'une réponse Helix"""
+        try:
+            limit = headers.get('Ratelimit-Limit')
+            remaining = headers.get('Ratelimit-Remaining')
+            reset = headers.get('Ratelimit-Reset')
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if limit:
+                    self.capacity = float(limit)
+                    self.rate = self.capacity / self.period
+                if remaining is not None:
+                    self._tokens = min(self._tokens, float(remaining))
+                    if int(remaining) <= 0 and reset:
+                        # Quota épuisé : tout le monde attend la réinitialisation
+                        delay = max(0.0, float(reset) - time.time())
+                        self._paused_until = max(self._paused_until, now + delay)
+        except (TypeError, ValueError):
+            pass
+
+    def should_retry(self, status):
+        return status == 429 or status >= 500
+
+    def retry_delay(self, attempt, status=None, headers=None):
+        """Délai avant la tentative suivante (avec jitter)"""
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        if status == 429 and headers is not None:
+            try:
+                delay = max(delay, float(headers.get('Ratelimit-Reset')) - time.time())
+            except (TypeError, ValueError):
+                pass
+        return min(self.max_backoff, delay) * random.uniform(0.5, 1.5)
+
+    def request(self, session, method, url, **kwargs):
+        """Exécute une requête requests en respectant le quota, avec nouvelles tentatives"""
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            if attempt:
+                self.record_retry()
+            try:
+                request_started = time.monotonic()
+                response = session.request(method, url, **kwargs)
+                self.observe_latency(time.monotonic() - request_started)
+            except requests.RequestException:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.retry_delay(attempt))
+                continue
+
+            self.update(response.headers)
+            if not self.should_retry(response.status_code) or attempt == self.max_retries:
+                return response
+            time.sleep(self.retry_delay(attempt, response.status_code, response.headers))
+
+    def observe_latency(self, seconds):
+        if self.metrics:
+            self.metrics.observe_latency('helix', seconds)
+
+    def record_retry(self):
+        if self.metrics:
+            self.metrics.record_retry('helix')
+
+
+class RateLimitedSession:
+    """
+    Enveloppe une requests.Session pour faire passer ses appels par un
+    RateLimitGovernor. Sur une réponse 401, on_unauthorized(en-têtes de la
+    requête) est appelé une fois ; s'il retourne True la requête est rejouée.
+    """
+
+    def __init__(self, session, governor, on_unauthorized=None):
+        self.session = session
+        self.governor = governor
+        self.on_unauthorized = on_unauthorized
+
+    @property
+    def headers(self):
+        return self.session.headers
+
+    def request(self, method, url, **kwargs):
+        response = self.governor.request(self.session, method, url, **kwargs)
+        if (response.status_code == 401 and self.on_unauthorized
+                and self.on_unauthorized(response.request.headers)):
+            response = self.governor.request(self.session, method, url, **kwargs)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
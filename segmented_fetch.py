@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from download_pool import DownloadCancelled
+from stream_writer import StreamWriter, READ_SIZE, preallocate
+
+# En dessous de cette taille, un clip est téléchargé en un seul flux
+SEGMENT_MIN_SIZE = 16 * 1024 * 1024
+
+# Nombre maximal de connexions ouvertes pour un même clip
+MAX_SEGMENTS = 4
+
+
+class RangeNotSupported(Exception):
+    """Levée lorsque le serveur ignore une requête Range pendant un téléchargement par segments"""
+    pass
+
+
+def supports_ranges(response):
+    return response.status_code == 206 or response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+
+
+def range_end(response):
+    """Dernier octet de la plage annoncée par Content-Range, ou None"""
+    try:
+        return int(response.headers['Content-Range'].split(' ', 1)[1].split('/')[0].split('-')[1])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def split_ranges(size, parts):
+    """Découpe [0, size) en parts plages contiguës [début, position, fin)"""
+    step = -(-size // parts)
+    return [[start, start, min(start + step, size)] for start in range(0, size, step)]
+
+
+class SegmentState:
+    """
+    Avancement d'un téléchargement par segments, gardé dans un fichier
+    .segments à côté du .part. Le .part a déjà sa taille finale : c'est
+    ce fichier, et non la taille du .part, qui indique ce qui reste à
+    télécharger lors d'une reprise.
+    """
+
+    def __init__(self, partpath, size, segments):
+        self.path = partpath + '.segments'
+        self.partpath = partpath
+        self.size = size
+        # Chaque segment est [début, position atteinte, fin)
+        self.segments = segments
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, partpath, size, parts):
+        with open(partpath, 'wb') as f:
+            f.truncate(size)
+            preallocate(f.fileno(), 0, size)
+        state = cls(partpath, size, split_ranges(size, parts))
+        state.save()
+        return state
+
+    @classmethod
+    def load(cls, partpath):
+        """Retourne l'état d'un téléchargement interrompu, ou None"""
+        path = partpath + '.segments'
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Un .part absent ou d'une autre taille a été réécrit entre-temps
+            if os.path.exists(partpath) and os.path.getsize(partpath) == data['size']:
+                return cls(partpath, data['size'], data['segments'])
+        except Exception as e:
+            print(f"Erreur lors de la lecture de l'état des segments: {e}")
+        os.remove(path)
+        return None
+
+    @property
+    def received(self):
+        return sum(position - start for start, position, end in self.segments)
+
+    @property
+    def complete(self):
+        return all(position >= end for start, position, end in self.segments)
+
+    def pending(self):
+        return [segment for segment in self.segments if segment[1] < segment[2]]
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'size': self.size, 'segments': self.segments}, f)
+            os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def fetch_segments(url, headers, state, connections, session=None, first_response=None,
+                   is_cancelled=None, on_bytes=None):
+    """
+    Télécharge les segments restants de state sur au plus connections
+    connexions, chaque segment étant écrit à sa position dans le .part.
+    session (par défaut le module requests) envoie les requêtes Range.
+    first_response, une réponse déjà ouverte au début du fichier, sert au
+    premier segment. Retourne True si le fichier est complet.
+    """
+    session = session or requests
+    pending = state.pending()
+
+    def fetch(segment, response=None):
+        start, position, end = segment
+        if is_cancelled and is_cancelled():
+            raise DownloadCancelled()
+        if response is None:
+            range_headers = dict(headers, Range=f'bytes={position}-{end - 1}')
+            response = session.get(url, headers=range_headers, stream=True, timeout=60)
+            if response.status_code != 206:
+                response.close()
+                raise RangeNotSupported(f"Réponse {response.status_code} à une requête Range")
+
+        writer = StreamWriter(state.partpath, position=position)
+        try:
+            with response:
+                while writer.written < end:
+                    if is_cancelled and is_cancelled():
+                        raise DownloadCancelled()
+                    count = writer.readinto(response.raw, min(READ_SIZE, end - writer.written))
+                    if not count:
+                        break
+                    if on_bytes:
+                        on_bytes(count)
+                if writer.written >= end and response.status_code == 206 and range_end(response) == end - 1:
+                    # Corps entièrement lu : la connexion retourne au pool. Une
+                    # réponse qui continue après le segment (200 ou première
+                    # réponse sur tout le fichier) est fermée en sortie du with.
+                    response.raw.drain_conn()
+                    response.raw.release_conn()
+        finally:
+            try:
+                # Position enregistrée une fois les données synchronisées sur le
+                # disque : après un crash, elle ne dépasse jamais les données écrites
+                writer.sync()
+                segment[1] = writer.written
+                state.save()
+            finally:
+                writer.close()
+
+    use_first = (first_response is not None and pending and pending[0][1] == 0)
+    if first_response is not None and not use_first:
+        first_response.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, connections)) as executor:
+        futures = [executor.submit(fetch, segment, first_response if use_first and i == 0 else None)
+                   for i, segment in enumerate(pending)]
+        errors = [future.exception() for future in futures]
+
+    for error in errors:
+        if isinstance(error, DownloadCancelled):
+            raise error
+    for error in errors:
+        if isinstance(error, RangeNotSupported):
+            state.remove()
+            raise error
+
+    if state.complete:
+        state.remove()
+        return True
+    return False
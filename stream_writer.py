@@ -0,0 +1,171 @@
+import ctypes
+import ctypes.util
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Taille du tampon d'écriture : les données reçues ne sont écrites sur le
+# disque que par blocs de cette taille
+BUFFER_SIZE = 1024 * 1024
+
+# Taille maximale d'une lecture réseau, pour garder l'annulation réactive
+READ_SIZE = 256 * 1024
+
+# Données écrites entre deux synchronisations disque en arrière-plan
+SYNC_EVERY = 32 * 1024 * 1024
+
+# Intervalle minimal entre deux appels de progression (en secondes)
+PROGRESS_INTERVAL = 0.1
+
+FALLOC_FL_KEEP_SIZE = 0x01
+
+_fallocate = None
+if sys.platform.startswith('linux'):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        _fallocate = _libc.fallocate
+        _fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+    except (OSError, AttributeError):
+        _fallocate = None
+
+_fdatasync = getattr(os, 'fdatasync', os.fsync)
+_sync_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sync')
+_local = threading.local()
+
+
+def preallocate(fd, offset, length):
+    """
+    Réserve l'espace disque d'un fichier sans changer sa taille (Linux).
+    La taille du .part reste celle des données reçues, ce qui garde la
+    reprise par Range correcte. Sans effet sur les autres systèmes.
+    """
+    if _fallocate is not None and length > 0:
+        # Simple optimisation : un échec (système de fichiers non compatible) est ignoré
+        _fallocate(fd, FALLOC_FL_KEEP_SIZE, offset, length)
+
+
+def thread_buffer(size=BUFFER_SIZE):
+    """Tampon réutilisé par tous les téléchargements d'un même thread"""
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None or len(buffer) != size:
+        buffer = _local.buffer = bytearray(size)
+    return buffer
+
+
+class ProgressThrottle:
+    """Limite la fréquence des appels de progression, le dernier appel (fichier complet) est toujours transmis"""
+
+    def __init__(self, callback, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self._last = 0.0
+
+    def __call__(self, downloaded, total, filename):
+        if not self.callback:
+            return
+        now = time.monotonic()
+        if now - self._last >= self.interval or (total and downloaded >= total):
+            self._last = now
+            self.callback(downloaded, total, filename)
+
+
+class StreamWriter:
+    """
+    Écriture d'un flux dans un fichier par grands blocs.
+
+    Les données sont lues directement dans un tampon réutilisable
+    (readinto) ou copiées dedans (write), puis écrites en une fois quand il
+    est plein. L'espace du fichier est réservé à l'ouverture d'après la
+    taille attendue, et les données sont synchronisées sur le disque en
+    arrière-plan toutes les SYNC_EVERY octets pour éviter d'accumuler des
+    pages en attente d'écriture. Le tampon est toujours vidé à la
+    fermeture, même après une erreur, pour que le .part reste reprenable.
+    """
+
+    def __init__(self, path, offset=0, total_size=0, buffer=None, sync_every=SYNC_EVERY, position=None):
+        if position is None:
+            self.file = open(path, 'ab' if offset else 'wb', buffering=0)
+            self.written = offset
+        else:
+            # Écriture à une position d'un fichier existant (téléchargement par segments)
+            self.file = open(path, 'r+b', buffering=0)
+            self.file.seek(position)
+            self.written = position
+        self.sync_every = sync_every
+        self._buffer = buffer if buffer is not None else bytearray(BUFFER_SIZE)
+        self._view = memoryview(self._buffer)
+        self._fill = 0
+        self._unsynced = 0
+        self._sync = None
+        if total_size > offset:
+            preallocate(self.file.fileno(), offset, total_size - offset)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def available(self):
+        """Place restante dans le tampon avant la prochaine écriture sur le disque"""
+        return len(self._buffer) - self._fill
+
+    def readinto(self, raw, size=READ_SIZE):
+        """Lit au plus size octets de raw dans le tampon. Retourne 0 en fin de flux"""
+        if self._fill == len(self._buffer):
+            self.flush()
+        count = raw.readinto(self._view[self._fill:self._fill + size]) or 0
+        self._fill += count
+        self.written += count
+        return count
+
+    def write(self, data):
+        data = memoryview(data)
+        while data:
+            if self._fill == len(self._buffer):
+                self.flush()
+            count = min(len(data), len(self._buffer) - self._fill)
+            self._view[self._fill:self._fill + count] = data[:count]
+            self._fill += count
+            self.written += count
+            data = data[count:]
+
+    def flush(self):
+        pending = self._view[:self._fill]
+        while pending:
+            count = self.file.write(pending)
+            pending = pending[count:]
+        self._unsynced += self._fill
+        self._fill = 0
+
+        if self.sync_every and self._unsynced >= self.sync_every:
+            self._unsynced = 0
+            self._wait_sync()
+            self._sync = _sync_executor.submit(_fdatasync, self.file.fileno())
+
+    def sync(self):
+        """Vide le tampon et attend que les données soient écrites sur le disque"""
+        self.flush()
+        self._wait_sync()
+        _fdatasync(self.file.fileno())
+
+    def _wait_sync(self):
+        if self._sync:
+            try:
+                self._sync.result()
+            except OSError:
+                pass
+            self._sync = None
+
+    def close(self):
+        if self.file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._wait_sync()
+            self.file.close()
+            self._view.release()
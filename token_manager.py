@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import time
+
+import requests
+
+AUTH_URL = 'https://id.twitch.tv/oauth2/token'
+
+
+class TokenManager:
+    """
+    Gestion du token d'application OAuth Twitch.
+
+    Le token et son expiration sont gardés dans un fichier (si cache_path
+    est fourni) et réutilisés d'une exécution à l'autre. Un minuteur le
+    renouvelle avant son expiration, et invalidate() permet de forcer un
+    renouvellement après une réponse 401. Les fonctions enregistrées avec
+    add_listener sont appelées avec chaque nouveau token.
+    """
+
+    def __init__(self, client_id, client_secret, cache_path=None, refresh_margin=3600):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self.access_token = None
+        self.expires_at = 0
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._timer = None
+        self._load_cache()
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f).get(self.client_id)
+            if entry and entry['expires_at'] > time.time() + self.refresh_margin:
+                self.access_token = entry['access_token']
+                self.expires_at = entry['expires_at']
+        except Exception as e:
+            print(f"Erreur lors de la lecture du cache du token: {e}")
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            cache = {}
+            if os.path.exists(self.cache_path):
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+            cache[self.client_id] = {'access_token': self.access_token, 'expires_at': self.expires_at}
+            tmp_path = self.cache_path + '.tmp'
+            # Le fichier contient un secret : lisible uniquement par l'utilisateur
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"Erreur lors de la sauvegarde du cache du token: {e}")
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def get_token(self):
+        """Retourne un token valide, en le demandant à Twitch si nécessaire"""
+        with self._lock:
+            if not self.access_token or self.expires_at <= time.time() + self.refresh_margin:
+                self._fetch_token()
+            return self.access_token
+
+    def invalidate(self, token):
+        """
+        Signale qu'un token a été refusé (401). Un seul renouvellement est
+        fait même si plusieurs requêtes échouent avec le même token.
+        Retourne le token à utiliser pour rejouer la requête.
+        """
+        with self._lock:
+            if token == self.access_token:
+                self._fetch_token()
+            return self.access_token
+
+    def _fetch_token(self):
+        auth_params = {
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'grant_type': 'client_credentials'
+        }
+        response = requests.post(AUTH_URL, params=auth_params, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        self.access_token = data['access_token']
+        self.expires_at = time.time() + data.get('expires_in', 0)
+        self._save_cache()
+        for callback in self._listeners:
+            callback(self.access_token)
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if self._timer:
+            self._timer.cancel()
+        delay = max(60, self.expires_at - time.time() - self.refresh_margin)
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            with self._lock:
+                self._fetch_token()
+        except Exception as e:
+            print(f"Erreur lors du renouvellement du token: {e}")
+            # Nouvel essai plus tard, le token actuel reste utilisable d'ici là
+            self._timer = threading.Timer(60, self._background_refresh)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def start(self):
+        """Obtient un token et programme son renouvellement automatique"""
+        self.get_token()
+        with self._lock:
+            if not self._timer:
+                self._schedule_refresh()
+
+    def stop(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
@@ -0,0 +1,180 @@
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+try:
+    import httpx
+    import h2  # noqa: F401 (requis par httpx pour HTTP/2)
+except ImportError:
+    # HTTP/2 facultatif : sans httpx[http2], tout passe par requests en HTTP/1.1
+    httpx = None
+
+# Connexions gardées ouvertes par hôte
+POOL_SIZE = 32
+
+# Durée de conservation des adresses résolues (en secondes)
+DNS_TTL = 300
+
+
+class DNSCache:
+    """
+    Résolutions DNS gardées en mémoire pendant ttl secondes : une nouvelle
+    connexion vers un hôte déjà résolu ne refait pas de requête DNS.
+    getaddrinfo n'indique pas la durée de validité des enregistrements,
+    ttl borne donc l'ancienneté des adresses utilisées ; les entrées
+    expirées sont retirées à chaque nouvelle résolution.
+    """
+
+    def __init__(self, ttl=DNS_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """Adresses (famille, type, proto, nom, sockaddr) de host:port, comme socket.getaddrinfo"""
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+        addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            self._entries[key] = (now + self.ttl, addresses)
+        return addresses
+
+
+class _CachedDNSConnection:
+    """
+    Connexion urllib3 qui résout son hôte par le DNSCache de sa classe
+    (dns_cache) et essaie chaque adresse à son tour. Seul le nom utilisé
+    pour la connexion TCP change : TLS vérifie toujours le nom d'hôte.
+    """
+
+    dns_cache = None
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = self.dns_cache.resolve(host, self.port)
+        except OSError:
+            # Erreur de résolution signalée par urllib3, comme sans cache
+            return super()._new_conn()
+        error = None
+        for address in addresses:
+            self._dns_host = address[4][0]
+            try:
+                return super()._new_conn()
+            except (NewConnectionError, ConnectTimeoutError) as e:
+                error = e
+            finally:
+                self._dns_host = host
+        raise error
+
+
+def _pool_classes(dns_cache):
+    """Classes de pools urllib3 dont les connexions utilisent dns_cache"""
+    classes = {}
+    for scheme, pool_class in (('http', HTTPConnectionPool), ('https', HTTPSConnectionPool)):
+        connection_class = type(f'CachedDNS{pool_class.ConnectionCls.__name__}',
+                                (_CachedDNSConnection, pool_class.ConnectionCls),
+                                {'dns_cache': dns_cache})
+        classes[scheme] = type(f'CachedDNS{pool_class.__name__}', (pool_class,),
+                               {'ConnectionCls': connection_class})
+    return classes
+
+
+class CachedDNSAdapter(HTTPAdapter):
+    """Adaptateur requests dont les connexions résolvent leur hôte par un DNSCache"""
+
+    def __init__(self, dns_cache=None, **kwargs):
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        if self.dns_cache:
+            self.poolmanager.pool_classes_by_scheme = _pool_classes(self.dns_cache)
+
+
+class Transport:
+    """
+    Sessions HTTP partagées par toutes les méthodes du téléchargeur.
+
+    Chaque hôte (GQL, CDN des clips...) a sa propre session et son propre
+    pool de pool_size connexions gardées ouvertes : les clips suivants
+    réutilisent les connexions TCP/TLS déjà établies au lieu d'en ouvrir
+    de nouvelles. Avec http2 et httpx[http2] installé, les requêtes sans
+    flux (GQL, HEAD) sont multiplexées sur une seule connexion HTTP/2 par
+    hôte ; les téléchargements restent en HTTP/1.1, une connexion par flux.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, http2=False, dns_ttl=DNS_TTL):
+        self.pool_size = pool_size
+        self.http2 = bool(http2 and httpx)
+        if http2 and not httpx:
+            print("Erreur: HTTP/2 demandé mais httpx[http2] n'est pas installé, HTTP/1.1 utilisé")
+        self.dns_ttl = dns_ttl
+        # Cache propre aux sessions de ce transport, sans effet sur le reste du processus
+        self.dns_cache = DNSCache(dns_ttl) if dns_ttl else None
+        self._sessions = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def mount(self, session):
+        """Applique la taille de pool à une session existante (par exemple Helix)"""
+        adapter = CachedDNSAdapter(self.dns_cache, pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def session(self, url):
+        """Session requests de l'hôte de url"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = self.mount(requests.Session())
+            return session
+
+    def _client(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            client = self._clients.get(host)
+            if client is None:
+                limits = httpx.Limits(max_connections=self.pool_size,
+                                      max_keepalive_connections=self.pool_size)
+                client = self._clients[host] = httpx.Client(http2=True, limits=limits)
+            return client
+
+    def request(self, method, url, **kwargs):
+        if self.http2 and not kwargs.get('stream'):
+            kwargs.pop('stream', None)
+            kwargs['follow_redirects'] = kwargs.pop('allow_redirects', method != 'HEAD')
+            return self._client(url).request(method, url, **kwargs)
+        return self.session(url).request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            for client in self._clients.values():
+                client.close()
+            self._sessions = {}
+            self._clients = {}
@@ -1,169 +1,575 @@
 import requests
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from bandwidth import throttle_wait
+from clip_enumerator import ClipEnumerator
+from download_pool import DownloadCancelled
+from metrics import Metrics, ClipStats
+from quality_policy import QualityPolicy
+from rate_limiter import RateLimitGovernor, RateLimitedSession
+from segmented_fetch import (SEGMENT_MIN_SIZE, MAX_SEGMENTS, RangeNotSupported, SegmentState,
+                             fetch_segments, supports_ranges)
+from stream_writer import StreamWriter, ProgressThrottle, thread_buffer
+from user_resolver import UserResolver
+from token_manager import TokenManager
+from transport import Transport
+
+GQL_URL = 'https://gql.twitch.tv/gql'
+GQL_CLIENT_ID = 'kimne78kx3ncx6brgo4mv6wki5h1ko'
+CLIP_ACCESS_TOKEN_HASH = '36b89d2507fce29e5ca551df756d27c1cfe079e2609642b4390aa4c35796eb11'
+
+# Nombre maximal d'opérations acceptées par Twitch dans un lot GQL
+GQL_BATCH_SIZE = 35
+
+# En dessous de cette taille, le fichier reçu n'est pas un clip valide
+MIN_CLIP_SIZE = 100000
+
+# Clips trouvés gardés en attente au plus avant de ralentir la recherche
+CLIP_QUEUE_SIZE = 500
+
+# Chaînes parcourues en même temps par une recherche sur plusieurs chaînes
+MAX_CHANNELS = 8
+
+DOWNLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0',
+    'Accept': '*/*',
+    # Pas de compression : les offsets Range doivent correspondre aux octets écrits
+    'Accept-Encoding': 'identity',
+    'Connection': 'keep-alive'
+}
+
+
+def build_clip_queries(slugs):
+    """Construit un lot d'opérations GQL VideoAccessToken_Clip"""
+    return [{
+        "operationName": "VideoAccessToken_Clip",
+        "variables": {
+            "slug": slug
+        },
+        "extensions": {
+            "persistedQuery": {
+                "version": 1,
+                "sha256Hash": CLIP_ACCESS_TOKEN_HASH
+            }
+        }
+    } for slug in slugs]
+
+
+def parse_clip_batch(slugs, data, policy=None):
+    """
+    Associe les réponses d'un lot GQL aux slugs. Retourne pour chaque slug
+    résolu la liste des URLs des qualités retenues par policy (de la
+    préférée à la moins bonne), et la liste des slugs à retenter.
+    """
+    if not isinstance(data, list) or len(data) != len(slugs):
+        return {}, list(slugs)
+
+    urls = {}
+    failed = []
+    # Les réponses d'un lot GQL arrivent dans l'ordre des opérations envoyées
+    for slug, entry in zip(slugs, data):
+        if not isinstance(entry, dict) or entry.get('errors'):
+            failed.append(slug)
+            continue
+        clip_data = (entry.get('data') or {}).get('clip')
+        renditions = build_source_urls(clip_data, policy) if clip_data else []
+        if renditions:
+            urls[slug] = renditions
+    return urls, failed
+
+
+def build_source_urls(clip_data, policy=None):
+    playback_url = clip_data.get('playbackAccessToken') or {}
+    qualities = clip_data.get('videoQualities') or []
+    if not playback_url or not qualities:
+        return []
+
+    signature = playback_url.get('signature', '')
+    token = playback_url.get('value', '')
+    if not signature or not token:
+        return []
+
+    ranked = (policy or QualityPolicy()).rank(qualities)
+    return [f"{quality['sourceURL']}?sig={signature}&token={token}" for quality in ranked]
+
+
+def clip_filename(clip):
+    """
+    Nom du fichier d'un clip, d'après son id : deux clips de même titre ne
+    s'écrasent plus, et le nom ne change pas si le titre est modifié. Le
+    titre et les autres informations sont dans les métadonnées du job.
+    """
+    clip_id = "".join(c for c in clip['id'] if c.isalnum() or c in ['_', '-'])
+    return f"{clip_id}.mp4"
+
 
 class TwitchClipDownloader:
-    def __init__(self, client_id, client_secret):
+    def __init__(self, client_id, client_secret, governor=None, user_cache_path=None,
+                 token_cache_path=None, token_manager=None, metrics=None, quality_policy=None,
+                 transport=None):
         self.client_id = client_id
         self.client_secret = client_secret
-        self.access_token = self._get_access_token()
-        self.session = requests.Session()
+        self.metrics = metrics or Metrics()
+        self.quality_policy = quality_policy or QualityPolicy()
+        # Connexions GQL et CDN gardées ouvertes d'un clip à l'autre
+        self.transport = transport or Transport()
+        self.session = self.transport.mount(requests.Session())
+        # Token réutilisé depuis le cache disque et renouvelé en arrière-plan
+        self.tokens = token_manager or TokenManager(client_id, client_secret, token_cache_path)
+        self.tokens.add_listener(self._set_token)
+        self.tokens.start()
         self.session.headers.update({
             'Client-ID': self.client_id,
             'Authorization': f'Bearer {self.access_token}'
         })
+        # Tous les appels Helix passent par le limiteur (éventuellement partagé entre jobs)
+        self.governor = governor or RateLimitGovernor()
+        if self.governor.metrics is None:
+            self.governor.metrics = self.metrics
+        self.helix = RateLimitedSession(self.session, self.governor,
+                                        on_unauthorized=self._handle_unauthorized)
+        self.users = UserResolver(self.helix, user_cache_path)
 
-    def _get_access_token(self):
-        auth_url = 'https://id.twitch.tv/oauth2/token'
-        auth_params = {
-            'client_id': self.client_id,
-            'client_secret': self.client_secret,
-            'grant_type': 'client_credentials'
-        }
-        response = requests.post(auth_url, params=auth_params)
-        return response.json()['access_token']
+    @property
+    def access_token(self):
+        return self.tokens.access_token
+
+    def _set_token(self, token):
+        self.session.headers['Authorization'] = f'Bearer {token}'
+
+    def _handle_unauthorized(self, request_headers):
+        """Renouvelle le token refusé ; retourne True si la requête peut être rejouée"""
+        used_token = (request_headers.get('Authorization') or '').replace('Bearer ', '')
+        try:
+            return self.tokens.invalidate(used_token) != used_token
+        except requests.RequestException:
+            return False
 
     def get_user_id(self, username):
-        url = f'https://api.twitch.tv/helix/users?login={username}'
-        response = self.session.get(url)
-        data = response.json()
-        user_id = data['data'][0]['id'] if data['data'] else None
-        return user_id
+        return self.users.resolve_one(username)
 
-    def get_clips(self, broadcaster_id, creator_id, start_date, end_date, limit=None):
+    def get_user_ids(self, usernames):
+        """Résout plusieurs logins en une ou quelques requêtes (100 logins par requête)"""
+        return self.users.resolve(usernames)
+
+    def get_clips(self, broadcaster_id, creator_id, start_date, end_date, limit=None, max_workers=4,
+                  index=None):
         """
         Récupère les clips pour un broadcaster et un créateur spécifiques.
+        La période est découpée en fenêtres parcourues en parallèle.
+        Avec un ClipIndex, seules les périodes non synchronisées sont
+        récupérées auprès de Helix et le résultat est lu depuis l'index.
         """
-        url = 'https://api.twitch.tv/helix/clips'
-        
-        start_datetime = f"{start_date.strftime('%Y-%m-%dT%H:%M:%S')}Z"
-        end_datetime = f"{end_date.strftime('%Y-%m-%dT%H:%M:%S')}Z"
-        
-        # On ne filtre que par broadcaster et dates dans la requête API
-        params = {
-            'broadcaster_id': broadcaster_id,
-            'started_at': start_datetime,
-            'ended_at': end_datetime,
-            'first': 100
-        }
-        
-        filtered_clips = []
-        pagination = None
-        
-        while True:
-            if pagination:
-                params['after'] = pagination
-            
-            response = self.session.get(url, params=params)
-            
-            if response.status_code != 200:
-                break
-            
-            data = response.json()
-            
-            if 'data' in data:
-                # Filtrer les clips par creator_id
-                new_clips = [clip for clip in data['data'] 
-                           if clip['creator_id'] == creator_id]
-                filtered_clips.extend(new_clips)
-            
-            if 'pagination' in data and 'cursor' in data['pagination']:
-                pagination = data['pagination']['cursor']
-                if limit and len(filtered_clips) >= limit:
+        if index is None:
+            enumerator = ClipEnumerator(self.helix, max_workers=max_workers)
+            return enumerator.enumerate(broadcaster_id, creator_id, start_date, end_date, limit)
+
+        for range_start, range_end in index.missing_ranges(broadcaster_id, start_date, end_date):
+            enumerator = ClipEnumerator(self.helix, max_workers=max_workers)
+            enumerator.enumerate(broadcaster_id, None, range_start, range_end, on_page=index.add_clips)
+            if enumerator.complete:
+                index.mark_synced(broadcaster_id, range_start, range_end)
+
+        return index.get_clips(broadcaster_id, creator_id, start_date, end_date, limit)
+
+    def iter_clips(self, broadcaster_id, creator_id, start_date, end_date, max_workers=4, index=None,
+                   queue_size=CLIP_QUEUE_SIZE, cancel=None):
+        """
+        Générateur des clips d'un créateur, produits au fil des pages Helix.
+
+        La recherche tourne dans un thread et remplit une file bornée : elle
+        se met en pause quand le consommateur prend du retard, et s'arrête
+        si le générateur est abandonné. Les clips ne sont pas triés. Avec un
+        ClipIndex, les périodes manquantes sont d'abord parcourues, puis
+        les clips déjà indexés sont lus depuis l'index.
+
+        cancel (threading.Event) arrête aussi la recherche, depuis un autre
+        thread que celui du consommateur : le générateur se termine alors
+        sans attendre de nouveau clip.
+        """
+        clips = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        enumerators = []
+        finished = object()
+
+        def stopped():
+            return stop.is_set() or (cancel is not None and cancel.is_set())
+
+        def put(item):
+            while not stopped():
+                try:
+                    clips.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def on_clips(new):
+            for clip in new:
+                put(clip)
+
+        def produce():
+            try:
+                if index is None:
+                    ranges = [(start_date, end_date)]
+                else:
+                    ranges = index.missing_ranges(broadcaster_id, start_date, end_date)
+                for range_start, range_end in ranges:
+                    if stopped():
+                        # Générateur abandonné : les périodes suivantes ne sont pas parcourues
+                        return
+                    enumerator = ClipEnumerator(self.helix, max_workers=max_workers, cancel=cancel)
+                    enumerators.append(enumerator)
+                    if stop.is_set():
+                        # Arrêt reçu après la vérification : le finally a pu manquer cet énumérateur
+                        enumerator.stop()
+                    enumerator.enumerate(broadcaster_id, creator_id, range_start, range_end,
+                                         on_page=index.add_clips if index else None,
+                                         on_clips=on_clips)
+                    if index and enumerator.complete and not stopped():
+                        index.mark_synced(broadcaster_id, range_start, range_end)
+                put(finished)
+            except Exception as e:
+                put(e)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        seen = set()
+        try:
+            while True:
+                try:
+                    item = clips.get(timeout=0.5)
+                except queue.Empty:
+                    if cancel is not None and cancel.is_set():
+                        return
+                    continue
+                self.metrics.set_queue_depth(clips.qsize())
+                if item is finished:
                     break
-            else:
-                break
-        
-        # Si une limite est spécifiée, on ne retourne que le nombre demandé
-        if limit:
-            return filtered_clips[:limit]
-        
-        return filtered_clips
+                if isinstance(item, Exception):
+                    raise item
+                seen.add(item['id'])
+                yield item
+
+            if index:
+                for clip in index.iter_clips(broadcaster_id, creator_id, start_date, end_date):
+                    if clip['id'] not in seen:
+                        yield clip
+        finally:
+            stop.set()
+            for enumerator in enumerators:
+                enumerator.stop()
+
+    def iter_clips_multi(self, broadcaster_ids, creator_id, start_date, end_date, max_workers=4, index=None,
+                         max_channels=MAX_CHANNELS, on_channel=None, queue_size=CLIP_QUEUE_SIZE):
+        """
+        Générateur des clips d'un créateur sur plusieurs chaînes.
+
+        Au plus max_channels chaînes sont parcourues en même temps (chacune
+        avec iter_clips), toutes les requêtes passant par le même limiteur
+        Helix, et leurs clips sont produits dans un seul flux borné au fil
+        des pages. on_channel(broadcaster_id, nombre de clips, erreur) est
+        appelé à la fin de chaque chaîne, depuis le thread de celle-ci :
+        une chaîne en erreur n'interrompt pas les autres.
+        """
+        clips = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        finished = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    clips.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def search(broadcaster_id):
+            count = 0
+            error = None
+            # stop est partagé : les recherches s'arrêtent dès que le flux est abandonné,
+            # même bloquées sur une chaîne qui ne produit plus de clips
+            channel_clips = self.iter_clips(broadcaster_id, creator_id, start_date, end_date,
+                                            max_workers=max_workers, index=index, cancel=stop)
+            try:
+                for clip in channel_clips:
+                    if stop.is_set():
+                        return
+                    put(clip)
+                    count += 1
+            except Exception as e:
+                error = e
+            finally:
+                channel_clips.close()
+            try:
+                if on_channel and not stop.is_set():
+                    on_channel(broadcaster_id, count, error)
+            finally:
+                put(finished)
+
+        broadcaster_ids = list(dict.fromkeys(broadcaster_ids))
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_channels, len(broadcaster_ids))))
+        for broadcaster_id in broadcaster_ids:
+            executor.submit(search, broadcaster_id)
+        remaining = len(broadcaster_ids)
+        try:
+            while remaining:
+                item = clips.get()
+                if item is finished:
+                    remaining -= 1
+                    continue
+                yield item
+        finally:
+            stop.set()
+            # Les chaînes pas encore commencées ne le seront pas
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def get_clip_source_url(self, clip_id):
-        gql_url = 'https://gql.twitch.tv/gql'
+        return self.get_clip_source_urls([clip_id]).get(clip_id)
+
+    def get_clip_source_urls(self, clip_ids, batch_size=GQL_BATCH_SIZE, max_retries=2):
+        """
+        Résout les URLs de téléchargement de plusieurs clips, dans la
+        qualité préférée par la politique de qualité.
+        Retourne un dictionnaire {slug: url}.
+        """
+        renditions = self.get_clip_renditions(clip_ids, batch_size, max_retries)
+        return {slug: urls[0] for slug, urls in renditions.items()}
+
+    def get_clip_renditions(self, clip_ids, batch_size=GQL_BATCH_SIZE, max_retries=2):
+        """
+        Résout les URLs de téléchargement de plusieurs clips en regroupant
+        les requêtes VideoAccessToken_Clip par lots dans un seul POST GQL.
+        Seules les entrées en erreur sont renvoyées lors des nouvelles tentatives.
+        Retourne un dictionnaire {slug: [URLs des qualités retenues]}.
+        """
+        resolved = {}
+        pending = list(dict.fromkeys(clip_ids))
+
+        for attempt in range(max_retries + 1):
+            if not pending:
+                break
+            if attempt:
+                self.metrics.record_retry('gql', len(pending))
+            failed = []
+            for i in range(0, len(pending), batch_size):
+                batch = pending[i:i + batch_size]
+                urls, batch_failed = self._resolve_clip_batch(batch)
+                resolved.update(urls)
+                failed.extend(batch_failed)
+            pending = failed
+
+        return resolved
+
+    def _resolve_clip_batch(self, slugs):
+        """
+        Envoie un lot de requêtes GQL. Retourne les URLs résolues et la liste
+        des slugs à retenter (erreurs GQL ou échec de la requête).
+        """
         headers = {
-            'Client-Id': 'kimne78kx3ncx6brgo4mv6wki5h1ko'
+            'Client-Id': GQL_CLIENT_ID
         }
         
-        query = [{
-            "operationName": "VideoAccessToken_Clip",
-            "variables": {
-                "slug": clip_id
-            },
-            "extensions": {
-                "persistedQuery": {
-                    "version": 1,
-                    "sha256Hash": "36b89d2507fce29e5ca551df756d27c1cfe079e2609642b4390aa4c35796eb11"
-                }
-            }
-        }]
-        
         try:
-            response = requests.post(gql_url, headers=headers, json=query)
+            request_started = time.monotonic()
+            response = self.transport.post(GQL_URL, headers=headers, json=build_clip_queries(slugs))
+            self.metrics.observe_latency('gql', time.monotonic() - request_started)
             data = response.json()
-            
-            if response.status_code == 200 and data:
-                clip_data = data[0].get('data', {}).get('clip', {})
-                if clip_data:
-                    playback_url = clip_data.get('playbackAccessToken', {})
-                    if playback_url:
-                        download_url = clip_data.get('videoQualities', [])[0].get('sourceURL', '')
-                        signature = playback_url.get('signature', '')
-                        token = playback_url.get('value', '')
-                        
-                        if download_url and signature and token:
-                            final_url = f"{download_url}?sig={signature}&token={token}"
-                            return final_url
-            return None
         except Exception as e:
-            print(f"Erreur lors de la récupération de l'URL source: {str(e)}")
-            return None
+            print(f"Erreur lors de la récupération des URLs source: {str(e)}")
+            return {}, list(slugs)
+
+        if response.status_code != 200:
+            return {}, list(slugs)
+
+        return parse_clip_batch(slugs, data, self.quality_policy)
 
-    def download_clip(self, clip, output_dir, progress_callback=None):
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+    def download_clip(self, clip, output_dir, progress_callback=None, pool=None, download_url=None,
+                      throttle=None, on_size=None):
+        """
+        Télécharge un clip. Si un DownloadPool est fourni, la connexion est
+        comptée dans la limite par hôte et l'annulation interrompt le flux.
+        download_url permet de fournir une URL déjà résolue par get_clip_source_urls.
+        throttle (voir BandwidthScheduler.for_job) reçoit le nombre d'octets
+        lus et retourne le délai à attendre pour respecter la limite de débit.
+        on_size reçoit la taille du fichier, annoncée par la réponse (ou
+        celle d'un téléchargement par segments repris), avant toute écriture.
+        """
+        os.makedirs(output_dir, exist_ok=True)
 
         clip_id = clip['id']
-        download_url = self.get_clip_source_url(clip_id)
+        if not download_url:
+            download_url = self.get_clip_source_url(clip_id)
         
         if not download_url:
             return False
 
-        filename = f"{clip['title']}.mp4"
-        filename = "".join(c for c in filename if c.isalnum() or c in ['_', '-', '.', ' '])
-        filepath = os.path.join(output_dir, filename)
+        filename = clip_filename(clip)
+        filepath = self.clip_path(clip, output_dir)
 
+        stats = ClipStats(clip_id, 0, None, 0.0, False)
+        started = time.monotonic()
+        self.metrics.clip_started()
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0',
-                'Accept': '*/*',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive'
-            }
+            stats.success = self._fetch_clip(download_url, filepath, filename, progress_callback, pool, stats,
+                                             throttle, on_size)
+            return stats.success
+        except DownloadCancelled:
+            stats.cancelled = True
+            raise
+        finally:
+            # Un échec pendant l'annulation est compté comme annulé, comme dans ClipJob.record
+            if not stats.success and pool and pool.is_cancelled():
+                stats.cancelled = True
+            stats.duration = time.monotonic() - started
+            self.metrics.clip_finished(stats)
 
-            response = requests.get(download_url, headers=headers, stream=True, timeout=60)
-            total_size = int(response.headers.get('content-length', 0))
+    def _fetch_clip(self, download_url, filepath, filename, progress_callback, pool, stats, throttle=None,
+                    on_size=None):
+        # Le téléchargement se fait dans un .part renommé une fois complet,
+        # un .part existant est repris avec une requête Range
+        partpath = filepath + '.part'
 
-            if total_size < 100000:
-                return False
+        try:
+            state = SegmentState.load(partpath)
+            if state:
+                # Reprise d'un téléchargement par segments
+                if on_size:
+                    on_size(state.size)
+                with pool.host_slot(download_url) if pool else nullcontext():
+                    return self._fetch_segmented(download_url, filepath, state, None,
+                                                 progress_callback, pool, stats, throttle)
+        except RangeNotSupported:
+            self._remove_file(partpath)
+        except DownloadCancelled:
+            raise
+        except Exception:
+            return False
+
+        try:
+            headers = dict(DOWNLOAD_HEADERS)
+
+            offset = os.path.getsize(partpath) if os.path.exists(partpath) else 0
+            if offset:
+                headers['Range'] = f'bytes={offset}-'
+
+            with pool.host_slot(download_url) if pool else nullcontext():
+                request_started = time.monotonic()
+                response = self.transport.get(download_url, headers=headers, stream=True, timeout=60)
+                stats.ttfb = time.monotonic() - request_started
+
+                if offset and response.status_code == 416:
+                    # .part invalide (plus grand que le fichier distant) : nouvelle requête complète
+                    response.close()
+                    del headers['Range']
+                    response = self.transport.get(download_url, headers=headers, stream=True, timeout=60)
+
+                if offset and response.status_code != 206:
+                    # Reprise refusée par le serveur : on recommence du début
+                    offset = 0
+                response.raise_for_status()
+
+                total_size = offset + int(response.headers.get('content-length', 0))
+
+                if total_size < MIN_CLIP_SIZE:
+                    response.close()
+                    self._remove_file(partpath)
+                    return False
+                if on_size:
+                    on_size(total_size)
+
+                if not offset and total_size >= SEGMENT_MIN_SIZE and supports_ranges(response):
+                    # Gros clip : plusieurs connexions si le serveur accepte les plages
+                    try:
+                        segmented = self._fetch_segmented(download_url, filepath, None, response,
+                                                          progress_callback, pool, stats, throttle)
+                        if segmented is not None:
+                            return segmented
+                    except RangeNotSupported:
+                        # Plages refusées en cours de route : nouvelle requête en un seul flux
+                        self._remove_file(partpath)
+                        response = self.transport.get(download_url, headers=headers, stream=True, timeout=60)
+                        response.raise_for_status()
 
-            with open(filepath, 'wb') as f:
-                downloaded = 0
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        if progress_callback:
-                            progress_callback(downloaded, total_size, filename)
-
-            file_size = os.path.getsize(filepath)
-            if file_size < 100000:
-                os.remove(filepath)
+                # Lecture directe dans le tampon du thread, écritures par blocs
+                # et progression limitée à quelques appels par seconde
+                progress = ProgressThrottle(progress_callback)
+                with StreamWriter(partpath, offset, total_size, buffer=thread_buffer()) as writer:
+                    while True:
+                        if pool and pool.is_cancelled():
+                            response.close()
+                            raise DownloadCancelled()
+                        count = writer.readinto(response.raw)
+                        if not count:
+                            break
+                        stats.bytes += count
+                        self.metrics.add_bytes(count)
+                        progress(writer.written, total_size, filename)
+                        if throttle:
+                            throttle_wait(throttle(count), pool.is_cancelled if pool else None)
+
+            file_size = os.path.getsize(partpath)
+            if file_size < total_size:
+                # Flux interrompu : le .part est conservé pour une reprise
                 return False
 
+            os.replace(partpath, filepath)
             return True
 
-        except Exception as e:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            return False
\ No newline at end of file
+        except Exception:
+            # Le .part est conservé pour reprendre au prochain lancement
+            return False
+
+    def _fetch_segmented(self, download_url, filepath, state, response, progress_callback, pool, stats,
+                         throttle=None):
+        """
+        Télécharge un clip par plages d'octets sur plusieurs connexions. La
+        connexion déjà réservée par l'appelant est complétée par celles
+        encore libres pour l'hôte, dans la limite de MAX_SEGMENTS. Retourne
+        None, sans toucher à response, si aucune connexion n'est libre pour
+        un nouveau téléchargement.
+        """
+        partpath = filepath + '.part'
+        filename = os.path.basename(filepath)
+        progress = ProgressThrottle(progress_callback)
+        lock = threading.Lock()
+
+        with pool.extra_host_slots(download_url, MAX_SEGMENTS - 1) if pool else nullcontext(MAX_SEGMENTS - 1) as extra:
+            if state is None:
+                if not extra:
+                    return None
+                total_size = int(response.headers.get('content-length', 0))
+                state = SegmentState.create(partpath, total_size, 1 + extra)
+            received = [state.received]
+
+            def on_bytes(count):
+                with lock:
+                    received[0] += count
+                    stats.bytes += count
+                    done = received[0]
+                self.metrics.add_bytes(count)
+                progress(done, state.size, filename)
+                if throttle:
+                    throttle_wait(throttle(count), pool.is_cancelled if pool else None)
+
+            complete = fetch_segments(download_url, DOWNLOAD_HEADERS, state, 1 + extra,
+                                      session=self.transport,
+                                      first_response=response,
+                                      is_cancelled=pool.is_cancelled if pool else None,
+                                      on_bytes=on_bytes)
+        if not complete:
+            return False
+        os.replace(partpath, filepath)
+        return True
+
+    def clip_path(self, clip, output_dir):
+        """Chemin final du fichier d'un clip dans output_dir"""
+        return os.path.join(output_dir, clip_filename(clip))
+
+    def _remove_file(self, path):
+        if os.path.exists(path):
+            os.remove(path)
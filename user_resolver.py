@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+import time
+
+HELIX_USERS_URL = 'https://api.twitch.tv/helix/users'
+
+# Nombre maximal de logins acceptés par Helix dans une requête /users
+USERS_BATCH_SIZE = 100
+
+
+class UserResolver:
+    """
+    Résolution login -> id Twitch avec cache.
+
+    Les logins inconnus du cache sont demandés à Helix par lots de 100 ;
+    les résultats sont gardés en mémoire et, si cache_path est fourni,
+    dans un fichier JSON réutilisé d'une exécution à l'autre jusqu'à
+    expiration (ttl en secondes).
+    """
+
+    def __init__(self, session, cache_path=None, ttl=7 * 24 * 3600):
+        self.session = session
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache = self._load_cache()
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Erreur lors de la lecture du cache des utilisateurs: {e}")
+            return {}
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            tmp_path = self.cache_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"Erreur lors de la sauvegarde du cache des utilisateurs: {e}")
+
+    def resolve(self, logins):
+        """Retourne un dictionnaire {login en minuscules: id ou None}"""
+        logins = list(dict.fromkeys(login.strip().lower() for login in logins if login))
+        now = time.time()
+        result = {}
+        missing = []
+
+        with self._lock:
+            for login in logins:
+                entry = self._cache.get(login)
+                if entry and entry['expires'] > now:
+                    result[login] = entry['id']
+                else:
+                    missing.append(login)
+
+        if not missing:
+            return result
+
+        for i in range(0, len(missing), USERS_BATCH_SIZE):
+            batch = missing[i:i + USERS_BATCH_SIZE]
+            response = self.session.get(HELIX_USERS_URL, params={'login': batch})
+            response.raise_for_status()
+            users = {user['login'].lower(): user['id'] for user in response.json().get('data', [])}
+
+            with self._lock:
+                for login in batch:
+                    user_id = users.get(login)
+                    result[login] = user_id
+                    # Les logins introuvables ne sont pas mis en cache
+                    if user_id:
+                        self._cache[login] = {'id': user_id, 'expires': now + self.ttl}
+
+        with self._lock:
+            self._save_cache()
+        return result
+
+    def resolve_one(self, login):
+        return self.resolve([login]).get(login.strip().lower())